@@ -63,6 +63,15 @@ class GRAuthorNotes(InterfaceActionBase):
         from calibre_plugins.grauthornotes.config import ConfigWidget
         return ConfigWidget()
 
+    def cli_main(self, argv):
+        '''
+        Run without the GUI, with calibre-debug -r "GR Author Notes" -- --library PATH ...
+        Use --help for the options.
+        '''
+        import sys
+        from calibre_plugins.grauthornotes.cli import main
+        sys.exit(main(argv[1:]))
+
     def save_settings(self, config_widget):
         '''
         Save the settings specified by the user with config_widget.
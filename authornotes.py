@@ -1,14 +1,25 @@
+import asyncio
 import base64
-import contextlib
 import re
 import json
+import threading
+from concurrent.futures import Future
 
+from calibre_plugins.grauthornotes.authorpage import parse_author_page # type: ignore
 from calibre_plugins.grauthornotes.config import prefs # type: ignore
+from calibre_plugins.grauthornotes.fingerprints import UNCHANGED, FingerprintIndex # type: ignore
+from calibre_plugins.grauthornotes import images # type: ignore
+from calibre_plugins.grauthornotes.images import get_image, import_note # type: ignore
+from calibre_plugins.grauthornotes.network import fetch, fetch_async, retry_async # type: ignore
+from calibre_plugins.grauthornotes.notetemplate import COLOR_MARKERS, note_template # type: ignore
+from calibre_plugins.grauthornotes.timing import stage # type: ignore
 from calibre_plugins.grauthornotes.trans import translate, translate_list # type: ignore
 from calibre_plugins.grauthornotes.unzip import install_chrome # type: ignore
 
-import requests
-from bs4 import BeautifulSoup as bs
+# Where links to Goodreads are built from. benchmarks/bench_pipeline.py points this at its stand-in server.
+GOODREADS_URL = 'https://www.goodreads.com'
+SCRIPT_END = b'</script>'
+LD_JSON = re.compile(rb'<script[^>]*?type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE)
 
 def link(author, db):
     """
@@ -26,36 +37,190 @@ def link(author, db):
     Returns:
         str: The Goodreads URL of the author if found, otherwise an empty string.
     """
-    alink = ''      # represents the Goodreads URL of the author
-    books = db.books_for_field('authors', author[0])        # get all books by the author
-    for book in books:      # iterate through each book by the author
-        mi = db.get_metadata(book)      # get metadata for the book
-        url = get_book_url(mi)      # get the Goodreads URL of the book
-        if not url:     # if the URL is not found, continue to the next book             
-            continue
-        print(f'url: {url}')       # Print the URL
-        gr_authors = get_booksoup(url)      # get the list of authors for the book from Goodreads
-        cleaned_author_name = ''.join(get_aname(author).split())        # get the author's name from Calibre
-        cleaned_author_name = cleaned_author_name.replace ("'", "&apos;")       # Terisa
-        print(f'Cleaned Author Name: {cleaned_author_name}')        # Terisa
-        for a in gr_authors:
-            gr_author_name = ''.join(a.get('name').split())        # get the author's name from Goodreads
-            print(f'GR Author Name: {gr_author_name}') # Terisa
-            if cleaned_author_name.lower() != gr_author_name.lower():     # compare the names
-                print(f'{cleaned_author_name} is not the same as {gr_author_name}')
-                continue
-            else:
-                print(f'{cleaned_author_name} is the same as {gr_author_name}')
-                alink = a.get('url')
-        if alink != '':
-            print(f'Author Link: not found')
-            break
+    alink = find_link(author, db)
     if alink != '':
         aval = {author[1].get('name') : alink}
         db.set_link_map('authors', aval, True)
+    return alink
+
+
+class LinkResolver:
+    """
+    Memory of the Goodreads author links and book pages seen during a run.
+
+    Every book page fetched while resolving one author also lists its co-authors
+    with their Goodreads URLs. They are all remembered here by their cleaned name,
+    so when the run reaches one of those co-authors its link is already known and
+    no page has to be downloaded.
+
+    The parsed ld+json author list of each book page is kept by URL as well, so an
+    anthology reached from ten of its authors is only fetched and parsed once. If
+    two workers (or two tasks of the asyncio pipeline) ask for the same book at the
+    same time, the second one waits for the first one's download instead of
+    starting its own.
+    """
+
+    def __init__(self):
+        self.authors = {}
+        self.books = {}
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def book_authors(self, url):
+        ### The ld+json author list of a book page, fetched at most once per run ###
+        with self._lock:
+            pending = self.books.get(url)
+            owner = pending is None
+            if owner:
+                pending = self.books[url] = Future()
+        if owner:
+            try:
+                gr_authors = get_booksoup(url)
+                self.remember(gr_authors)
+            except BaseException as e:
+                # waiters must never be left on a Future nobody will resolve
+                with self._lock:
+                    del self.books[url]
+                pending.set_exception(e)
+                raise
+            pending.set_result(gr_authors)
+        return pending.result()
+
+    async def book_authors_async(self, url, session):
+        ### book_authors() on the event loop, where a download already running is awaited instead ###
+        task = self.tasks.get(url)
+        if task is None:
+            task = self.tasks[url] = asyncio.ensure_future(get_booksoup_async(url, session))
+        try:
+            gr_authors = await asyncio.shield(task)
+        except Exception:
+            if self.tasks.get(url) is task:
+                del self.tasks[url]
+            raise
+        self.remember(gr_authors)
+        return gr_authors
+
+    def remember(self, gr_authors):
+        if isinstance(gr_authors, dict):
+            gr_authors = [gr_authors]
+        with self._lock:
+            for a in gr_authors or []:
+                if not isinstance(a, dict):
+                    continue
+                name, url = a.get('name'), a.get('url')
+                if name and url:
+                    self.authors.setdefault(''.join(name.split()).lower(), url)
+
+    def known(self, cleaned_author_name):
+        with self._lock:
+            return self.authors.get(cleaned_author_name.lower(), '')
+
+
+def find_link(author, db, resolver=None):
+    """
+    Find the Goodreads URL for a given author without writing it to the database.
+
+    This only reads from the database, so it is safe to call from a worker thread.
+    The caller is responsible for storing the link with ``db.set_link_map``.
+
+    The author's books are ranked by how reliably their identifiers lead to the right
+    Goodreads page (goodreads id, then isbn, then amazon id) and fetched one at a time,
+    stopping at the first page that lists the author.
+
+    Args:
+        author (tuple): A tuple containing author information. The first element is the author's name,
+                        and the second element is a dictionary with additional author details.
+        db (object): The database object that provides methods to interact with the book database.
+        resolver (LinkResolver): Links already seen during this run, shared between authors.
+
+    Returns:
+        str: The Goodreads URL of the author if found, otherwise an empty string.
+    """
+    if resolver is None:
+        resolver = LinkResolver()
+    cleaned_author_name = clean_name(author)
+    alink = resolver.known(cleaned_author_name)
+    if alink:
         return alink
-    else:
-        return ''
+    with stage('db_read'):
+        books = db.books_for_field('authors', author[0])        # get all books by the author
+        urls = rank_book_urls(db, books)
+    for url in urls:      # best candidates first, fetched lazily
+        print(f'url: {url}')       # Print the URL
+        try:
+            resolver.book_authors(url)      # get the list of authors for the book from Goodreads
+        except Exception as e:
+            # one bad book page should not hide the author's other books
+            print(f"Book Error: {url}: {e}")
+            continue
+        alink = resolver.known(cleaned_author_name)
+        if alink:
+            print(f'Author Link: {alink}')
+            return alink
+    return ''
+
+async def find_link_async(author, db, resolver, session):
+    ### find_link() for the asyncio pipeline, downloading on session ###
+    cleaned_author_name = clean_name(author)
+    alink = resolver.known(cleaned_author_name)
+    if alink:
+        return alink
+    with stage('db_read'):
+        urls = await asyncio.to_thread(lambda: rank_book_urls(db, db.books_for_field('authors', author[0])))
+    for url in urls:
+        print(f'url: {url}')
+        try:
+            await resolver.book_authors_async(url, session)
+        except Exception as e:
+            print(f"Book Error: {url}: {e}")
+            continue
+        alink = resolver.known(cleaned_author_name)
+        if alink:
+            print(f'Author Link: {alink}')
+            return alink
+    return ''
+
+def clean_name(author):
+    cleaned_author_name = ''.join(get_aname(author).split())        # get the author's name from Calibre
+    return cleaned_author_name.replace ("'", "&apos;")       # Terisa
+
+
+def rank_book_urls(db, books):
+    ### Goodreads URLs for the books, goodreads ids before isbns before amazon ids ###
+    ranked = ([], [], [])
+    for ids in db.all_field_for('identifiers', books, {}).values():
+        ids = ids or {}
+        url = book_url_from_ids(ids)
+        if url:
+            # the same test book_url_from_ids makes, so an empty goodreads id ranks by what the url was built from
+            ranked[0 if ids.get('goodreads') else 1 if ids.get('isbn') else 2].append(url)
+    return [url for urls in ranked for url in dict.fromkeys(urls)]
+
+
+def select_authors(db, book_ids, clear, overwrite):
+    """
+    The ids of the authors of the given books that should be processed.
+
+    Each author is looked at once, however many of the books they wrote. Which
+    authors have a note comes from one query, and whether the plugin wrote that
+    note from the fingerprint index, so no note is exported or searched except
+    for notes written before the index existed.
+    """
+    authorids = list(dict.fromkeys(aid for bid in book_ids for aid in db.field_ids_for('authors', bid)))
+    if clear or overwrite:
+        return authorids
+    with_notes = db.get_all_items_that_have_notes('authors')
+    fingerprints = FingerprintIndex(db.library_id)
+    selected = []
+    for aid in authorids:
+        if aid in with_notes and not fingerprints.generated(aid):
+            if 'Generated using the GR Author Notes plugin' in db.notes_for('authors', aid):
+                fingerprints.mark(aid)
+        if aid in with_notes and fingerprints.generated(aid):
+            continue
+        selected.append(aid)
+    fingerprints.save()
+    return selected
 
 
 def clear(author, db):
@@ -68,88 +233,169 @@ def clear(author, db):
 
 def notes(author, db, bgcolor, bordercolor, textcolor, author_link):
     ### Find Author and add notes from GR Bio ###
-    for _ in range(5):
-        with contextlib.suppress(Exception):
-            
-            try:
-                url = ''
-                if author_link != '':
-                    url = author_link
-                elif not prefs['only_confirmed']:
-                    url = get_author_url(author)
-                if not url:
-                    return False
-                #Get BeautifulSoup object
-                soup = get_soup(url)
-                #open('D:\\testa.xml','w').write(soup.prettify ())
-            except Exception as e:
-                print(f"Soup Error: {e}")
-
-            #Get authorName
-            authorName = soup.find(class_ = "authorName")
-            if authorName == '':
-                return False
+    html = build_note(author, bgcolor, bordercolor, textcolor, author_link)
+    if not html:
+        return False
+    try:
+        save_note(db, author[0], html)
+        return True
+    except Exception:
+        return False
 
-            try:
-                #Get Author bio
-                bio = get_bio(soup)
-            except Exception as e:
-                print(f"Bio Error: {e}")
-
-            #Get dataTitles
-            dataTitles = soup.find_all(class_ = "dataTitle")
-            if len(dataTitles) == 0 and bio == '':
-                return False
-            titles = [t.text.strip() for t in dataTitles]
-            
-
-            #Get dataItems
-            dataItems = soup.find_all(class_ = "dataItem")
-            try:
-                items = items_list(dataItems)
-            except Exception as e:
-                print(f"Items_List error: {e}")
-            try:
-                items = fix_items(items, dataTitles, titles)
-            except Exception as e:
-                print(f"fix_items error: {e}")
+def save_note(db, author_id, html):
+    ### Write a note made by build_note() to the database ###
+    if prefs['image_resources']:
+        import_note(db, author_id, html)
+    else:
+        db.import_note('authors', author_id, html, path_is_data=True)
 
-            #Get author image
-            try:
-                dataurl = get_author_image(soup)
-            except Exception as e:
-                print(f"Get image error: {e}")
-
-            #Translate
-            if prefs['translate']:
-                lang = prefs['language']
-                bio = translate(bio, lang)
-                titles = translate_list(titles, lang)
-                items = translate_list(items, lang)
-
-            #Generate html
-            try:
-                html = gen_html(authorName, bio, titles, items, dataurl)
-                html = html_color(bgcolor, bordercolor, textcolor, html)
-            except Exception as e:
-                print(f"html error: {e}")
+def build_note(author, bgcolor, bordercolor, textcolor, author_link, unchanged=None):
+    """
+    Fetch the GR Bio and render the note html, without touching the database.
 
-            #Set author note
-            try:
-                db.import_note('authors', author[0], html, path_is_data=True)
-                return True
-            except Exception:
-                return False
-    return False
+    Args:
+        unchanged (callable): Called as ``unchanged(url, page)`` once the author page
+                              is parsed. If it returns True nothing is translated or
+                              rendered and ``UNCHANGED`` is returned instead of html.
+    """
+    # Every request below is paced and retried on its own by network.retry(), so a
+    # failure here is final for this run and is not worth fetching everything again
+    url = note_url(author, author_link)
+    if not url:
+        return ''
+    try:
+        #Get the parts of the author page that go into the note
+        with stage('fetch'):
+            text = fetch(url).text
+        with stage('parse'):
+            page = parse_author_page(text)
+    except Exception as e:
+        print(f"Page Error: {e}")
+        return ''
+
+    #Get authorName
+    authorName = page.name
+    if authorName == '':
+        return ''
+
+    #Get Author bio
+    bio = page.bio
+
+    #Get dataTitles
+    titles = page.titles
+    if len(titles) == 0 and bio == '':
+        return ''
+
+    #Skip authors whose note would come out the same as last time
+    if unchanged is not None and unchanged(url, page):
+        return UNCHANGED
+
+    #Get dataItems
+    items = page.items
+    try:
+        items = fix_items(items, page.born, titles)
+    except Exception as e:
+        print(f"fix_items error: {e}")
+
+    #Get author image
+    try:
+        with stage('image'):
+            dataurl = get_author_image(page.image_url)
+    except Exception as e:
+        print(f"Get image error: {e}")
+        return ''
+
+    #Translate
+    if prefs['translate']:
+        with stage('translate'):
+            bio, titles, items = translate_note(bio, titles, items, prefs['language'])
+
+    #Generate html
+    try:
+        with stage('render'):
+            return note_template(bgcolor, bordercolor, textcolor).render(authorName, bio, titles, items, dataurl)
+    except Exception as e:
+        print(f"html error: {e}")
+        return ''
+
+async def build_note_async(session, author, bgcolor, bordercolor, textcolor, author_link, unchanged=None):
+    """
+    build_note() for the asyncio pipeline, downloading on session.
+
+    The author image and the translation do not depend on each other, so they are
+    done side by side once the page is parsed. Blocking work (parsing, database
+    reads, shrinking the image, googletrans) runs on the loop's thread pool.
+    """
+    url = note_url(author, author_link)
+    if not url:
+        return ''
+    try:
+        with stage('fetch'):
+            text = (await fetch_async(session, url)).text
+        with stage('parse'):
+            page = await asyncio.to_thread(parse_author_page, text)
+    except Exception as e:
+        print(f"Page Error: {e}")
+        return ''
+
+    authorName = page.name
+    if authorName == '':
+        return ''
+    bio = page.bio
+    titles = page.titles
+    if len(titles) == 0 and bio == '':
+        return ''
+    if unchanged is not None and await asyncio.to_thread(unchanged, url, page):
+        return UNCHANGED
+    items = page.items
+    try:
+        items = fix_items(items, page.born, titles)
+    except Exception as e:
+        print(f"fix_items error: {e}")
+
+    async def image():
+        with stage('image'):
+            store = images.store or images.open_store()
+            imgpath = store.cached(page.image_url)
+            if imgpath is None:
+                imgdata = await retry_async(lambda: session.get(page.image_url), page.image_url)
+                imgpath = await asyncio.to_thread(store.add, page.image_url, imgdata)
+            return image_src(imgpath)
+
+    async def translated():
+        if not prefs['translate']:
+            return bio, titles, items
+        with stage('translate'):
+            return await asyncio.to_thread(translate_note, bio, titles, items, prefs['language'])
+
+    dataurl, parts = await asyncio.gather(image(), translated(), return_exceptions=True)
+    if isinstance(dataurl, Exception):
+        print(f"Get image error: {dataurl}")
+        return ''
+    if isinstance(parts, Exception):
+        raise parts
+    bio, titles, items = parts
+    try:
+        with stage('render'):
+            return note_template(bgcolor, bordercolor, textcolor).render(authorName, bio, titles, items, dataurl)
+    except Exception as e:
+        print(f"html error: {e}")
+        return ''
+
+def note_url(author, author_link):
+    ### The author page to build the note from, or '' if there is none to go on ###
+    if author_link != '':
+        return author_link
+    if not prefs['only_confirmed']:
+        return get_author_url(author)
+    return ''
+
+def translate_note(bio, titles, items, lang):
+    return translate(bio, lang), translate_list(titles, lang), translate_list(items, lang)
 
 def gen_html(authorName, bio, titles, items, dataurl):
-    html = "<div>\r\n   <table border=\"0\" style=\"border-collapse: collapse\" cellspacing=\"2\" cellpadding=\"0\">\r\n      <thead>\r\n         <tr>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: middle; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <h1 align=\"center\" style=\"margin-top: 18px; margin-bottom: 12px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><strong style=\"font-family: \'Arial\',\'sans-serif\'; font-size: xx-large; color: [textcolor]\">"
-    html = f'{html}{authorName}</strong></h1>\r\n            </td>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p align=\"center\" style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><img src=\"'
-    html = f'{html}{dataurl}\" style=\"vertical-align: top\"></p>\r\n            </td>\r\n         </tr>\r\n      </thead>\r\n      <tbody>\r\n         '
-    for c in range(len(titles)):
-        html = f'{html}<tr>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><strong style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]; background-color: [bgcolor]\">{titles[c]}</strong></p>\r\n            </td>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]; background-color: [bgcolor]\">{items[c]}</span></p>\r\n            </td>\r\n         </tr>\r\n         '
-    html = f'{html}<tr>\r\n            <td colspan=\"2\" bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\" id=\"freeTextContainerauthor23386367\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]\"></span><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]\">{bio}</span></p><p align=\"right\" style=\"margin-top: 12px; margin-bottom: 12px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: #242424\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 8px; color: #ffffff; background-color: #242424\">Generated using the GR Author Notes plugin</span></p>\r\n            </td>\r\n         </tr>\r\n      </tbody>\r\n   </table>\r\n</div>'
-    return html
+    # the color markers are left in place for html_color()
+    return note_template(*COLOR_MARKERS).render(authorName, bio, titles, items, dataurl)
 
 def html_color(bgcolor, bordercolor, textcolor, html):
     html = html.replace("[bgcolor]", bgcolor)
@@ -165,69 +411,75 @@ def get_aname(author):
     aname = aname.strip()
     return aname
 
-def get_author_image(soup):
-    imgdiv = soup.find( class_ = "leftContainer authorLeftContainer")
-    imgurl = imgdiv.find( "img" )['src']
-    imgdata = requests.get(imgurl)
-    encoded_image = base64.b64encode(imgdata.content)
+def get_author_image(imgurl):
+    return image_src(get_image(imgurl))
+
+def image_src(imgpath):
+    if prefs['image_resources']:
+        # a file next to the note html, turned into a note resource by save_note()
+        return imgpath.name
+    encoded_image = base64.b64encode(imgpath.read_bytes())
     finalimg = encoded_image.decode('utf-8')
     return f'data:image/jpeg;base64,{finalimg}'
 
-def get_bio(soup):
-    biodiv = soup.find( class_ = "aboutAuthorInfo")     # find the div containing the author's bio
-    biospans = biodiv.find_all( "span" )    # find all the spans in the div
-    return biospans[-1] if len(biospans) >= 1 else ''     # return the last span in the div
-
 def get_author_url(author):
     aname = get_aname(author)
     aname = aname.replace(' ', '%20')
-    return f'https://www.goodreads.com/book/author/{aname}'
+    return f'{GOODREADS_URL}/book/author/{aname}'
 
 def set_author_link(author, link, db):
     return
 
-def get_soup(url):
-    webdata = requests.get(url, headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"})
-    return bs(webdata.text, "html.parser")
+def has_book_authors(data, start=0):
+    ### True once a complete ld+json block naming the authors has been downloaded ###
+    # only a block closed by the bytes from start on is new, so each one is looked at once
+    end = data.find(SCRIPT_END, max(0, start - len(SCRIPT_END) + 1))
+    while end != -1:
+        block = LD_JSON.search(data, data.rfind(b'<script', 0, end), end + len(SCRIPT_END))
+        if block is not None and b'"author"' in block.group(1):
+            return True
+        end = data.find(SCRIPT_END, end + 1)
+    return False
 
 def get_booksoup(url):
-    soup = get_soup(url)
+    # Only the ld+json blocks are needed, so the rest of the page is neither parsed nor downloaded
+    with stage('link'):
+        webdata = fetch(url, until=has_book_authors)
+        return book_authors_from(webdata.content)
+
+async def get_booksoup_async(url, session):
+    with stage('link'):
+        webdata = await fetch_async(session, url, until=has_book_authors)
+        return book_authors_from(webdata.content)
+
+def book_authors_from(content):
     book_dict = {}
-    for script in soup.find_all("script",type="application/ld+json"):
-        book_dict = json.loads(script.contents[0])
-    return book_dict.get('author') if book_dict else {}
-
-
-def items_list(dataItems):
-    items = []
-    for i in dataItems:
-        freetext = i.find_all("span", {"id" : lambda L: L and L.startswith('freeText')})
-        if len(freetext) > 1:
-            i = freetext[1].decode_contents()
-        else:
-            i = i.decode_contents().replace('href="/', 'href="https://www.goodreads.com/').strip()
-        items.append(i)
-    return items
+    for script in LD_JSON.finditer(content):
+        book_dict = json.loads(script.group(1))
+    return (book_dict.get('author') or []) if isinstance(book_dict, dict) else []
+
 
 def get_book_url(book):
-    ids = book.identifiers
+    return book_url_from_ids(book.identifiers)
+
+def book_url_from_ids(ids):
     goodreads = ids.get('goodreads')
     isbn = ids.get('isbn')
     amazon = ids.get('amazon')
     if goodreads:
-        return f'https://www.goodreads.com/book/show/{goodreads}'
+        return f'{GOODREADS_URL}/book/show/{goodreads}'
     elif isbn:
-        return f'https://www.goodreads.com/book/isbn/{isbn}'
+        return f'{GOODREADS_URL}/book/isbn/{isbn}'
     elif amazon:
-        return f'https://www.goodreads.com/book/isbn/{amazon}'
+        return f'{GOODREADS_URL}/book/isbn/{amazon}'
     else:
         return ''
 
-def fix_items(items, dataTitles, titles):
-    if titles[0] == "Born":
-        textstr = dataTitles[0].next_sibling.strip()
+def fix_items(items, born, titles):
+    if titles[0] == "Born" and born is not None:
+        textstr = born.strip()
         if len(titles) > len(items):
             items.insert(0, textstr)
         elif len(titles) == len(items) and len(textstr) != 0:
             items[0] = f'{textstr}; {items[0].strip()}'
-    return items
\ No newline at end of file
+    return items
@@ -0,0 +1,165 @@
+import html as htmlmod
+import re
+
+try:
+    import lxml.html as lxmlhtml
+except ImportError:
+    lxmlhtml = None
+
+# Every start tag that carries a class attribute. The author page is scanned with
+# this once, and only the few elements the notes need are cut out of the source.
+CLASSED = re.compile(r'<([a-zA-Z][\w:-]*)(?:\s[^>]*?)?\sclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\')[^>]*>')
+SPAN = re.compile(r'<span\b[^>]*>', re.IGNORECASE)
+FREETEXT = re.compile(r'<span\b[^>]*?\sid\s*=\s*["\']freeText[^>]*>', re.IGNORECASE)
+IMG_SRC = re.compile(r'<img\b[^>]*?\ssrc\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.IGNORECASE)
+TAGS = re.compile(r'<[^>]*>')
+LEFT_CONTAINER = 'leftContainer authorLeftContainer'
+_closers = {}
+
+class AuthorPage:
+    """
+    The parts of a Goodreads author page that go into a note.
+
+    ``name`` and ``bio`` are html fragments (the ``authorName`` element and the last
+    span of ``aboutAuthorInfo``), ``titles`` and ``items`` are the ``dataTitle`` and
+    ``dataItem`` rows, ``born`` is the loose text after the first ``dataTitle``
+    (``None`` when an element follows it directly) and ``image_url`` is the source of
+    the portrait in the left container.
+    """
+
+    __slots__ = ('name', 'bio', 'titles', 'items', 'born', 'image_url')
+
+    def __init__(self, name='', bio='', titles=None, items=None, born=None, image_url=''):
+        self.name = name
+        self.bio = bio
+        self.titles = titles or []
+        self.items = items or []
+        self.born = born
+        self.image_url = image_url
+
+
+def parse_author_page(text, use_lxml=None):
+    """
+    Extract an :class:`AuthorPage` from the html of a Goodreads author page.
+
+    The page is read with a single regex pass over the source that only cuts out
+    the elements the notes need. If that finds nothing recognisable (markup it
+    cannot follow) and lxml is importable, which it always is inside calibre, the
+    page is parsed again with lxml. Neither path builds a BeautifulSoup tree.
+
+    Args:
+        text (str): The page html.
+        use_lxml (bool): Force (True) or skip (False) the lxml path. None uses
+                         lxml only as the fallback described above.
+    """
+    if use_lxml:
+        return parse_lxml(text)
+    page = parse_stream(text)
+    if use_lxml is None and lxmlhtml is not None and not (page.name or page.titles or page.bio):
+        return parse_lxml(text)
+    return page
+
+
+def _closer(tag):
+    pat = _closers.get(tag)
+    if pat is None:
+        pat = _closers[tag] = re.compile(r'<(/?)%s\b[^>]*>' % re.escape(tag), re.IGNORECASE)
+    return pat
+
+def _element(text, start, end, tag):
+    ### Source span of the element whose start tag is text[start:end]: (inner_start, inner_end, outer_end) ###
+    if text[end - 2] == '/':
+        return end, end, end
+    depth = 1
+    for m in _closer(tag).finditer(text, end):
+        if m.group(1):
+            depth -= 1
+            if depth == 0:
+                return end, m.start(), m.end()
+        elif not m.group(0).endswith('/>'):
+            depth += 1
+    return end, len(text), len(text)
+
+def _text(fragment):
+    return htmlmod.unescape(TAGS.sub('', fragment))
+
+def _item(inner):
+    freetext = [m for m in FREETEXT.finditer(inner)]
+    if len(freetext) > 1:
+        m = freetext[1]
+        istart, iend, _ = _element(inner, m.start(), m.end(), 'span')
+        return inner[istart:iend]
+    return inner.replace('href="/', 'href="https://www.goodreads.com/').strip()
+
+def parse_stream(text):
+    ### Single regex pass over the page source ###
+    page = AuthorPage()
+    for m in CLASSED.finditer(text):
+        value = m.group(2) if m.group(2) is not None else m.group(3)
+        classes = value.split()
+        tag = m.group(1).lower()
+        if 'dataTitle' in classes:
+            istart, iend, oend = _element(text, m.start(), m.end(), tag)
+            if not page.titles:
+                nxt = text.find('<', oend)
+                tail = text[oend:nxt if nxt > -1 else len(text)]
+                page.born = htmlmod.unescape(tail) if tail else None
+            page.titles.append(_text(text[istart:iend]).strip())
+        elif 'dataItem' in classes:
+            istart, iend, _ = _element(text, m.start(), m.end(), tag)
+            page.items.append(_item(text[istart:iend]))
+        elif 'authorName' in classes and not page.name:
+            _, _, oend = _element(text, m.start(), m.end(), tag)
+            page.name = text[m.start():oend]
+        elif 'aboutAuthorInfo' in classes and not page.bio:
+            istart, iend, _ = _element(text, m.start(), m.end(), tag)
+            region = text[istart:iend]
+            spans = [s for s in SPAN.finditer(region)]
+            if spans:
+                s = spans[-1]
+                _, _, send = _element(region, s.start(), s.end(), 'span')
+                page.bio = region[s.start():send]
+        elif value == LEFT_CONTAINER and not page.image_url:
+            istart, iend, _ = _element(text, m.start(), m.end(), tag)
+            img = IMG_SRC.search(text, istart, iend)
+            if img:
+                page.image_url = htmlmod.unescape(img.group(1) if img.group(1) is not None else img.group(2))
+    return page
+
+
+def _classed(cls):
+    return f'//*[contains(concat(" ", normalize-space(@class), " "), " {cls} ")]'
+
+def _outer(el):
+    return lxmlhtml.tostring(el, encoding='unicode', with_tail=False)
+
+def _inner(el):
+    return htmlmod.escape(el.text or '', quote=False) + ''.join(
+        lxmlhtml.tostring(child, encoding='unicode', with_tail=True) for child in el)
+
+def parse_lxml(text):
+    ### lxml builds its tree in C, which is still far cheaper than BeautifulSoup ###
+    root = lxmlhtml.fromstring(text)
+    page = AuthorPage()
+    names = root.xpath(_classed('authorName'))
+    if names:
+        page.name = _outer(names[0])
+    for t in root.xpath(_classed('dataTitle')):
+        if not page.titles:
+            page.born = t.tail
+        page.titles.append(t.text_content().strip())
+    for i in root.xpath(_classed('dataItem')):
+        freetext = i.xpath('.//span[starts-with(@id, "freeText")]')
+        if len(freetext) > 1:
+            page.items.append(_inner(freetext[1]))
+        else:
+            page.items.append(_inner(i).replace('href="/', 'href="https://www.goodreads.com/').strip())
+    about = root.xpath(_classed('aboutAuthorInfo'))
+    if about:
+        spans = about[0].xpath('.//span')
+        if spans:
+            page.bio = _outer(spans[-1])
+    src = root.xpath(f'//*[@class="{LEFT_CONTAINER}"]//img/@src')
+    if src:
+        page.image_url = src[0]
+    return page
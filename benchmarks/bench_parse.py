@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compare the author page extractor with the BeautifulSoup path it replaced.
+
+Usage: python benchmarks/bench_parse.py [author_page.html ...]
+
+Without arguments a synthetic page shaped like a Goodreads author page (a few
+hundred KB, mostly the book list and scripts around the bits we read) is used.
+Every page is checked to give the same name, bio, titles, items and image URL on
+all paths before anything is timed.
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from authorpage import parse_author_page, lxmlhtml  # noqa: E402
+from authorpage import _text as text_of  # noqa: E402
+
+def synthetic_page(books=400):
+    rows = ''.join(
+        f'<tr itemscope itemtype="http://schema.org/Book"><td width="5%"><a title="Book {n}" href="/book/show/{n}">'
+        f'<img alt="Book {n}" class="bookCover" src="https://images.gr-assets.com/books/{n}s.jpg" /></a></td>'
+        f'<td><a class="bookTitle" href="/book/show/{n}"><span itemprop="name" role="heading">Book {n} &amp; more</span></a>'
+        f'<span class="greyText smallText uitext"><span class="minirating">3.9{n % 10} avg rating &mdash; {n * 7} ratings</span></span>'
+        f'<script type="text/javascript">var x{n} = {{"id": {n}, "class": "bookTitle"}};</script></td></tr>\n'
+        for n in range(books))
+    return f'''<!DOCTYPE html><html><head><title>Jane Doe</title>
+<script>{"var filler = 1;" * 2000}</script></head><body>
+<div class="mainContentContainer"><div class="mainContent">
+<div class="leftContainer authorLeftContainer">
+  <a title="Jane Doe" rel="nofollow" href="/photo/author/1.Jane_Doe"><img alt="Jane Doe" itemprop="image" src="https://images.gr-assets.com/authors/1/1.jpg?a=1&amp;b=2" /></a>
+</div>
+<div class="rightContainer">
+  <h1 class="authorName"><span itemprop="name">Jane Doe</span></h1>
+  <div class="dataTitle">Born</div>
+  in London, The United Kingdom
+  <div class="dataItem" itemprop='birthDate'>March 01, 1950</div>
+  <div class="dataTitle">Website</div>
+  <div class="dataItem"><a target="_blank" rel="nofollow noopener noreferrer" itemprop="url" href="http://janedoe.example">http://janedoe.example</a></div>
+  <div class="dataTitle">Genre</div>
+  <div class="dataItem"><a href="/genres/fantasy">Fantasy</a>, <a href="/genres/science-fiction">Science Fiction</a></div>
+  <div class="dataTitle">Influences</div>
+  <div class="dataItem"><span id="freeTextContainerinfluences1">Tolkien, Le Guin...</span><span id="freeTextinfluences1" style="display:none">Tolkien, Le Guin, <a href="/author/show/2">Someone Else</a></span><a data-text-id="influences1" href="#">...more</a></div>
+  <div class="aboutAuthorInfo">
+    <span id="freeTextContainerauthor1">Jane Doe is a writer...</span>
+    <span id="freeTextauthor1" style="display:none">Jane Doe is a writer of <i>many</i> books.<br /><br />She lives in London &amp; Paris.</span>
+    <a data-text-id="author1" href="#">...more</a>
+  </div>
+  <table class="stacked tableList">{rows}</table>
+</div></div></div></body></html>'''
+
+def parse_bs4(text):
+    ### The extraction notes() did before authorpage, as close to verbatim as possible ###
+    from bs4 import BeautifulSoup as bs
+    soup = bs(text, "html.parser")
+    name = soup.find(class_ = "authorName")
+    biospans = soup.find( class_ = "aboutAuthorInfo").find_all( "span" )
+    bio = biospans[-1] if len(biospans) >= 1 else ''
+    dataTitles = soup.find_all(class_ = "dataTitle")
+    titles = [t.text.strip() for t in dataTitles]
+    items = []
+    for i in soup.find_all(class_ = "dataItem"):
+        freetext = i.find_all("span", {"id" : lambda L: L and L.startswith('freeText')})
+        if len(freetext) > 1:
+            i = freetext[1].decode_contents()
+        else:
+            i = i.decode_contents().replace('href="/', 'href="https://www.goodreads.com/').strip()
+        items.append(i)
+    born = dataTitles[0].next_sibling if dataTitles else None
+    image_url = soup.find( class_ = "leftContainer authorLeftContainer").find( "img" )['src']
+    return str(name), str(bio), titles, items, str(born), image_url
+
+def summary(page):
+    return page.name, page.bio, page.titles, page.items, str(page.born), page.image_url
+
+def normalized(fields):
+    ### Markup serialisation differs between parsers, the text and urls must not ###
+    name, bio, titles, items, born, image_url = fields
+    return (' '.join(text_of(name).split()), ' '.join(text_of(bio).split()), titles,
+            [' '.join(text_of(i).split()) for i in items], born.strip(), image_url)
+
+def main(paths):
+    pages = [Path(p).read_text(encoding='utf-8') for p in paths] or [synthetic_page()]
+    paths = [('stream', lambda t: summary(parse_author_page(t, use_lxml=False)))]
+    if lxmlhtml is not None:
+        paths.append(('lxml', lambda t: summary(parse_author_page(t, use_lxml=True))))
+    try:
+        import bs4  # noqa: F401
+        paths.insert(0, ('bs4 html.parser', parse_bs4))
+    except ImportError:
+        print('bs4 not importable, timing the extractors only')
+    for n, text in enumerate(pages):
+        results = {label: normalized(fn(text)) for label, fn in paths}
+        first = next(iter(results.values()))
+        for label, result in results.items():
+            if result != first:
+                raise SystemExit(f'page {n}: {label} disagrees\n{result}\n{first}')
+    print(f'{len(pages)} page(s), {sum(len(p) for p in pages) // 1024} KB, all paths agree')
+    base = None
+    for label, fn in paths:
+        number = 5 if label.startswith('bs4') else 50
+        best = min(timeit.repeat(lambda: [fn(p) for p in pages], number=number, repeat=3)) / number
+        base = base or best
+        print(f'{label:>16}: {best * 1000:8.2f} ms per pass  ({base / best:5.1f}x)')
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput of the author pipeline against the offline Goodreads stand-in.
+
+Usage:
+  CALIBRE_CONFIG_DIRECTORY=/tmp/grbench calibre-debug benchmarks/bench_pipeline.py -- \\
+      [--authors 500] [--workers 4] [--latency 80] [--jitter 40] [--error-rate 0.02] \\
+      [--linked 0.5] [--rate 5] [--per-host 2] [--no-cache] [--async] [--http2] [--warm]
+
+Starts ``fixture_server.py`` in-process and drives the real engine, note writer,
+cache, image store and link resolver from this working tree against it, for a
+made-up library of N authors. ``--linked`` is the share of authors that already
+have their Goodreads link. The rest are resolved from their books, half of them
+through goodreads ids and half through isbn redirects. ``--http2`` serves them over
+TLS and HTTP/2 instead, with a throwaway certificate made by the openssl command,
+to compare the asyncio pipeline multiplexing requests with one per connection.
+
+The calibre database is replaced by an in-memory stand-in, so note import time is
+not measured. Everything else is the code the plugin runs.
+
+It needs calibre's Python (for calibre.utils.config and Qt), and a throwaway
+CALIBRE_CONFIG_DIRECTORY so the cache, image store and settings of the real
+calibre install are not touched.
+
+Reports authors/sec, p50/p95 per-author latency, requests and bytes served, peak
+RSS and the plugin's own per-stage timing. ``--warm`` runs a second pass over the same library with the cache and
+fingerprint index filled by the first one.
+"""
+import argparse
+import os
+import tempfile
+import sys
+import threading
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fixture_server import FixtureServer, Fixtures, H2FixtureServer, isbn, self_signed_cert  # noqa: E402
+
+def load_plugin():
+    ### Make this working tree importable as calibre_plugins.grauthornotes ###
+    pkg = sys.modules.get('calibre_plugins')
+    if pkg is None:
+        pkg = sys.modules['calibre_plugins'] = types.ModuleType('calibre_plugins')
+        pkg.__path__ = []
+    sub = sys.modules['calibre_plugins.grauthornotes'] = types.ModuleType('calibre_plugins.grauthornotes')
+    sub.__path__ = [str(ROOT)]
+    pkg.grauthornotes = sub
+
+
+class Library:
+    """The calls the pipeline makes on ``db.new_api``, kept in memory."""
+
+    def __init__(self, fixtures, linked=0.5):
+        self.library_id = 'bench'
+        self.fixtures = fixtures
+        self.notes = {}
+        self.links = {}
+        self._lock = threading.Lock()
+        cutoff = int(fixtures.authors * linked)
+        self.authors = {
+            aid: {'name': f'Author {aid}', 'sort': f'{aid}, Author',
+                  'link': f'{fixtures.base}/author/show/{aid}.Author_{aid}' if aid <= cutoff else ''}
+            for aid in range(1, fixtures.authors + 1)}
+
+    def author_data(self, author_ids=None):
+        ids = self.authors if author_ids is None else author_ids
+        return {aid: dict(self.authors[aid]) for aid in ids}
+
+    def books_for_field(self, field, item_id):
+        return set(self.fixtures.books_of(item_id))
+
+    def field_ids_for(self, field, book_id):
+        return (self.fixtures.author_of(book_id),)
+
+    def all_field_for(self, field, book_ids, default_value=None):
+        return {bid: {'goodreads': str(bid)} if bid % 2 == 0 else {'isbn': isbn(bid)} for bid in book_ids}
+
+    def set_link_map(self, field, value_map, only_set_empty=False):
+        with self._lock:
+            self.links.update(value_map)
+
+    def notes_for(self, field, item_id):
+        with self._lock:
+            return self.notes.get(item_id, '')
+
+    def import_note(self, field, item_id, path_or_stream_or_data, path_is_data=False):
+        data = path_or_stream_or_data if path_is_data else Path(path_or_stream_or_data).read_text(encoding='utf-8')
+        with self._lock:
+            self.notes[item_id] = data
+
+    def set_notes_for(self, field, item_id, doc, searchable_text=None, resource_hashes=(), remove_unused_resources=False):
+        with self._lock:
+            self.notes[item_id] = doc
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_pass(server, library, workers, use_cache, use_async=False):
+    from calibre_plugins.grauthornotes.engine import AsyncAuthorEngine, AuthorEngine  # noqa: E402
+    from calibre_plugins.grauthornotes.writer import NoteWriter  # noqa: E402
+
+    class TimedEngine(AuthorEngine):
+        def process(self, author):
+            start = time.perf_counter()
+            try:
+                return super().process(author)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    class TimedAsyncEngine(AsyncAuthorEngine):
+        async def process_async(self, author):
+            start = time.perf_counter()
+            try:
+                return await super().process_async(author)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    latencies = []
+    authors = list(library.author_data().items())
+    engine = (TimedAsyncEngine if use_async else TimedEngine)(library, ('#242424', '#fffcf0', '#ffffff'), workers=workers, use_cache=use_cache)
+    writer = NoteWriter(library, None)
+    states = {}
+    before = server.snapshot()
+    started = time.perf_counter()
+    engine.start(authors)
+    try:
+        while True:
+            results = engine.drain()
+            final = engine.finished
+            for result, state in writer.apply(results, engine, final)[1]:
+                states[state] = states.get(state, 0) + 1
+            if final:
+                break
+            time.sleep(0.01)
+    finally:
+        engine.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    after = server.snapshot()
+    return {
+        'authors': len(authors),
+        'seconds': elapsed,
+        'authors_per_sec': len(authors) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'requests': after['requests'] - before['requests'],
+        'errors': after['errors'] - before['errors'],
+        'not_modified': after['not_modified'] - before['not_modified'],
+        'mb': (after['bytes'] - before['bytes']) / (1024 * 1024),
+        'states': states,
+        'stages': engine.stats.report() if engine.stats is not None else '',
+    }
+
+def report(name, r):
+    states = ', '.join(f'{k} {v}' for k, v in sorted(r['states'].items()))
+    rss = peak_rss_mb()
+    print(f"{name}: {r['authors']} authors in {r['seconds']:.2f}s = {r['authors_per_sec']:.1f} authors/s; "
+          f"latency p50 {r['p50_ms']:.0f} ms, p95 {r['p95_ms']:.0f} ms")
+    print(f"  {r['requests']} requests ({r['errors']} errors, {r['not_modified']} not modified), {r['mb']:.1f} MB served; "
+          f"peak RSS {'n/a' if rss is None else f'{rss:.0f} MB'}; {states}")
+    if r['stages']:
+        print('  ' + r['stages'].replace('\n', '\n  '))
+
+def main(argv):
+    if argv and argv[0] == '--':
+        argv = argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--authors', type=int, default=200)
+    parser.add_argument('--books-per-author', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=50.0, help='ms added to every response')
+    parser.add_argument('--jitter', type=float, default=25.0, help='up to this many extra ms')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--linked', type=float, default=0.5, help='share of authors that already have a link')
+    parser.add_argument('--fixtures', help='directory of recorded pages, see fixture_server.py')
+    parser.add_argument('--rate', type=int, default=None, help='requests per second per site (default: plugin setting)')
+    parser.add_argument('--per-host', type=int, default=None, help='simultaneous requests per site (default: plugin setting)')
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='use the asyncio pipeline; --workers is then the authors in progress at once')
+    parser.add_argument('--http2', action='store_true', help='serve over TLS and HTTP/2 and let the plugin use it')
+    parser.add_argument('--warm', action='store_true', help='run a second pass on the filled cache')
+    args = parser.parse_args(argv)
+
+    if not os.environ.get('CALIBRE_CONFIG_DIRECTORY'):
+        sys.exit('Set CALIBRE_CONFIG_DIRECTORY to a throwaway directory so the real calibre settings are left alone')
+    load_plugin()
+    from calibre_plugins.grauthornotes import authornotes  # noqa: E402
+    from calibre_plugins.grauthornotes.config import prefs  # noqa: E402
+    # only ever written to the throwaway config directory
+    if args.rate is not None:
+        prefs['request_rate'] = args.rate
+    if args.per_host is not None:
+        prefs['per_host_limit'] = args.per_host
+    if args.http2:
+        prefs['http2'] = True
+
+    fixtures = Fixtures(args.authors, args.books_per_author, args.fixtures)
+    if args.http2:
+        certfile, keyfile = self_signed_cert(tempfile.mkdtemp(prefix='grbench-'))
+        # httpx trusts the certificates of SSL_CERT_FILE
+        os.environ['SSL_CERT_FILE'] = certfile
+        server = H2FixtureServer(fixtures, certfile, keyfile, latency=args.latency, jitter=args.jitter,
+                                 error_rate=args.error_rate).start()
+    else:
+        server = FixtureServer(fixtures, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    authornotes.GOODREADS_URL = server.url
+    try:
+        library = Library(fixtures, args.linked)
+        print(f'{args.authors} authors, {args.workers} workers, {args.latency:.0f}+{args.jitter:.0f} ms latency, '
+              f'{args.error_rate:.0%} errors, {prefs["request_rate"]} requests/s and {prefs["per_host_limit"]} at once per site, '
+              f'cache {"on" if args.use_cache else "off"}, {"asyncio pipeline" if args.use_async else "threads"}'
+              f'{" over HTTP/2" if args.http2 else ""}')
+        report('cold', run_pass(server, library, args.workers, args.use_cache, args.use_async))
+        if args.warm:
+            report('warm', run_pass(server, library, args.workers, args.use_cache, args.use_async))
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare the compiled note template with the gen_html/html_color code it replaced.
+
+Usage: python benchmarks/bench_render.py [authors]
+
+Renders notes for a batch of made-up authors both ways, checks the html is byte
+identical and times both.
+"""
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from notetemplate import note_template  # noqa: E402
+
+# gen_html and html_color as they were before the template, kept verbatim as the reference
+def gen_html(authorName, bio, titles, items, dataurl):
+    html = "<div>\r\n   <table border=\"0\" style=\"border-collapse: collapse\" cellspacing=\"2\" cellpadding=\"0\">\r\n      <thead>\r\n         <tr>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: middle; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <h1 align=\"center\" style=\"margin-top: 18px; margin-bottom: 12px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><strong style=\"font-family: \'Arial\',\'sans-serif\'; font-size: xx-large; color: [textcolor]\">"
+    html = f'{html}{authorName}</strong></h1>\r\n            </td>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p align=\"center\" style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><img src=\"'
+    html = f'{html}{dataurl}\" style=\"vertical-align: top\"></p>\r\n            </td>\r\n         </tr>\r\n      </thead>\r\n      <tbody>\r\n         '
+    for c in range(len(titles)):
+        html = f'{html}<tr>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><strong style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]; background-color: [bgcolor]\">{titles[c]}</strong></p>\r\n            </td>\r\n            <td bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]; background-color: [bgcolor]\">{items[c]}</span></p>\r\n            </td>\r\n         </tr>\r\n         '
+    html = f'{html}<tr>\r\n            <td colspan=\"2\" bgcolor=\"[bgcolor]\" style=\"vertical-align: top; padding-left: 5; padding-right: 5; padding-top: 10; padding-bottom: 10; border-top: 1px; border-right: 1px; border-bottom: 1px; border-left: 1px; border-top-color: [bordercolor]; border-right-color: [bordercolor]; border-bottom-color: [bordercolor]; border-left-color: [bordercolor]; border-top-style: solid; border-right-style: solid; border-bottom-style: solid; border-left-style: solid\">\r\n               <p style=\"margin-top: 0px; margin-bottom: 0px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: [bgcolor]\" id=\"freeTextContainerauthor23386367\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]\"></span><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 14px; color: [textcolor]\">{bio}</span></p><p align=\"right\" style=\"margin-top: 12px; margin-bottom: 12px; margin-left: 0px; margin-right: 0px; text-indent: 0px; background-color: #242424\"><span style=\"font-family: \'Arial\',\'sans-serif\'; font-size: 8px; color: #ffffff; background-color: #242424\">Generated using the GR Author Notes plugin</span></p>\r\n            </td>\r\n         </tr>\r\n      </tbody>\r\n   </table>\r\n</div>'
+    return html
+
+def html_color(bgcolor, bordercolor, textcolor, html):
+    html = html.replace("[bgcolor]", bgcolor)
+    html = html.replace("[bordercolor]", bordercolor)
+    html = html.replace("[textcolor]", textcolor)
+    return html
+
+def made_up_authors(count, seed=1):
+    rnd = random.Random(seed)
+    words = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor'.split()
+    labels = ['Born', 'Died', 'Website', 'Twitter', 'Genre', 'Influences', 'Member Since', 'URL']
+    authors = []
+    for n in range(count):
+        rows = rnd.randint(2, len(labels))
+        bio = '<span id="freeTextauthor%d">%s</span>' % (n, ' '.join(rnd.choice(words) for _ in range(rnd.randint(50, 600))))
+        items = ['<a href="https://www.goodreads.com/genres/x">%s</a>' % rnd.choice(words) for _ in range(rows)]
+        authors.append(('<h1 class="authorName"><span itemprop="name">Author %d</span></h1>' % n, bio,
+                        labels[:rows], items, 'data:image/jpeg;base64,' + 'A' * rnd.randint(2000, 20000)))
+    return authors
+
+def main(count=2000):
+    colors = ('#242424', '#fffcf0', '#ffffff')
+    authors = made_up_authors(count)
+    authors.append(('[bgcolor] in a name', '[textcolor]', ['[bordercolor]'], ['x'], ''))
+
+    def old():
+        return [html_color(*colors, gen_html(*a)) for a in authors]
+
+    def new():
+        template = note_template(*colors)
+        return [template.render(*a) for a in authors]
+
+    if old() != new():
+        raise SystemExit('rendered notes differ')
+    print(f'{len(authors)} notes, byte identical')
+    base = None
+    for label, fn in (('gen_html + html_color', old), ('note_template', new)):
+        best = min(timeit.repeat(fn, number=3, repeat=3)) / 3
+        base = base or best
+        print(f'{label:>22}: {best * 1000:8.2f} ms per batch  ({base / best:5.1f}x)')
+
+if __name__ == '__main__':
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+An offline stand-in for the parts of Goodreads the plugin talks to.
+
+Usage: python benchmarks/fixture_server.py [--port 8765] [--authors 1000] [--latency 80] [--error-rate 0.02]
+
+Serves, for authors numbered 1..N:
+
+  /author/show/<id>[.<slug>]   author page (ETag / If-None-Match aware)
+  /book/show/<id>              book page with an ld+json block naming its authors
+  /book/isbn/<isbn>            302 to the book page
+  /book/author/<name>          302 to the author page of "Author <n>"
+  /images/authors/<id>.png     portrait; every 7th author gets the shared nophoto image
+  /__stats                     request/byte/error counters as JSON
+
+Book ``k`` is written by author ``(k - 1) // books_per_author + 1`` and every fifth
+book has the next author as co-author, so the link resolver's memo gets used. The
+isbn of book ``k`` is ``978`` followed by ``k`` padded to ten digits.
+
+Pages are made up unless ``--fixtures DIR`` holds recorded ones as
+``DIR/author/<id>.html`` or ``DIR/book/<id>.html``, which are served as they are.
+
+Each response waits ``latency`` ms (plus up to ``jitter`` ms). With ``error_rate``
+that share of requests is answered with 503 or 429 (``Retry-After: 0``) or 500.
+Only the standard library is used, so it runs anywhere. The same pages can also
+be served over TLS and HTTP/2 by ``H2FixtureServer``, which needs the bundled h2
+package and the openssl command for its certificate.
+"""
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import random
+import re
+import ssl
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+ISBN_PREFIX = '978'
+HTML = 'text/html; charset=utf-8'
+
+def png(width, height, rgb):
+    ### A solid colored PNG, so image shrinking has something real to decode ###
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    row = b'\x00' + bytes(rgb) * width
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height)) + chunk(b'IEND', b''))
+
+def isbn(book_id):
+    return f'{ISBN_PREFIX}{book_id:010d}'
+
+class Fixtures:
+    """The made-up (or recorded) pages for a library of numbered authors."""
+
+    def __init__(self, authors=100, books_per_author=2, fixtures=None, book_rows=200):
+        self.authors = authors
+        self.books_per_author = books_per_author
+        self.fixtures = Path(fixtures) if fixtures else None
+        self.book_rows = book_rows
+        self.base = ''
+        self._images = {}
+
+    def recorded(self, kind, ident):
+        if self.fixtures is not None:
+            path = self.fixtures.joinpath(kind, f'{ident}.html')
+            if path.is_file():
+                return path.read_bytes()
+        return None
+
+    def author_of(self, book_id):
+        return (book_id - 1) // self.books_per_author + 1
+
+    def books_of(self, author_id):
+        first = (author_id - 1) * self.books_per_author + 1
+        return list(range(first, first + self.books_per_author))
+
+    def image_url(self, author_id):
+        if author_id % 7 == 0:
+            return f'{self.base}/images/nophoto/user/u_200x266.png'
+        return f'{self.base}/images/authors/{author_id}.png'
+
+    def image(self, name):
+        data = self._images.get(name)
+        if data is None:
+            seed = int(hashlib.sha1(name.encode()).hexdigest()[:6], 16)
+            data = self._images[name] = png(300, 400, (seed & 255, (seed >> 8) & 255, (seed >> 16) & 255))
+        return data
+
+    def author_page(self, author_id):
+        recorded = self.recorded('author', author_id)
+        if recorded is not None:
+            return recorded
+        name = f'Author {author_id}'
+        rows = ''.join(
+            f'<tr itemscope itemtype="http://schema.org/Book"><td width="5%"><a title="Book {n}" href="/book/show/{n}">'
+            f'<img alt="Book {n}" class="bookCover" src="{self.base}/images/books/{n}.png" /></a></td>'
+            f'<td><a class="bookTitle" href="/book/show/{n}"><span itemprop="name" role="heading">Book {n} &amp; more</span></a>'
+            f'<span class="greyText smallText uitext"><span class="minirating">3.9{n % 10} avg rating &mdash; {n * 7} ratings</span></span></td></tr>\n'
+            for n in range(self.book_rows))
+        return f'''<!DOCTYPE html><html><head><title>{name}</title>
+<script>{"var filler = 1;" * 1000}</script></head><body>
+<div class="mainContentContainer"><div class="mainContent">
+<div class="leftContainer authorLeftContainer">
+  <a title="{name}" rel="nofollow" href="/photo/author/{author_id}"><img alt="{name}" itemprop="image" src="{html.escape(self.image_url(author_id))}" /></a>
+</div>
+<div class="rightContainer">
+  <h1 class="authorName"><span itemprop="name">{name}</span></h1>
+  <div class="dataTitle">Born</div>
+  in London, The United Kingdom
+  <div class="dataItem" itemprop='birthDate'>March {author_id % 28 + 1:02d}, 1950</div>
+  <div class="dataTitle">Website</div>
+  <div class="dataItem"><a target="_blank" rel="nofollow noopener noreferrer" itemprop="url" href="http://author{author_id}.example">http://author{author_id}.example</a></div>
+  <div class="dataTitle">Genre</div>
+  <div class="dataItem"><a href="/genres/fantasy">Fantasy</a>, <a href="/genres/science-fiction">Science Fiction</a></div>
+  <div class="aboutAuthorInfo">
+    <span id="freeTextContainerauthor{author_id}">{name} is a writer...</span>
+    <span id="freeTextauthor{author_id}" style="display:none">{name} is a writer of <i>many</i> books.<br /><br />{"They live in London &amp; Paris. " * (author_id % 5 + 1)}</span>
+    <a data-text-id="author{author_id}" href="#">...more</a>
+  </div>
+  <table class="stacked tableList">{rows}</table>
+</div></div></div></body></html>'''.encode('utf-8')
+
+    def book_page(self, book_id):
+        recorded = self.recorded('book', book_id)
+        if recorded is not None:
+            return recorded
+        author_ids = [self.author_of(book_id)]
+        if book_id % 5 == 0 and author_ids[0] < self.authors:
+            author_ids.append(author_ids[0] + 1)
+        data = {
+            '@context': 'https://schema.org', '@type': 'Book', 'name': f'Book {book_id}', 'isbn': isbn(book_id),
+            'author': [{'@type': 'Person', 'name': f'Author {a}', 'url': f'{self.base}/author/show/{a}.Author_{a}'} for a in author_ids],
+        }
+        return f'''<!DOCTYPE html><html><head><title>Book {book_id}</title>
+<script type="application/ld+json">{json.dumps(data)}</script></head><body>
+<div id="__next">{"<div class='ReviewCard'>A review that goes on and on.</div>" * 2000}</div></body></html>'''.encode('utf-8')
+
+
+def respond(server, path, if_none_match=None):
+    """
+    The answer of the stand-in to a GET of ``path``, whichever server it came in on.
+
+    Returns:
+        tuple: status, body, content type, extra headers and whether to count it.
+    """
+    if path == '/__stats':
+        return 200, json.dumps(server.snapshot()).encode(), 'application/json', None, False
+    failure = server.failure()
+    if failure:
+        return failure, b'', HTML, {'Retry-After': '0'} if failure != 500 else None, True
+    fixtures = server.fixtures
+    m = re.fullmatch(r'/author/show/(\d+)(?:\.\S*)?', path)
+    if m and 0 < int(m.group(1)) <= fixtures.authors:
+        body = fixtures.author_page(int(m.group(1)))
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if if_none_match == etag:
+            return 304, b'', HTML, {'ETag': etag}, True
+        return 200, body, HTML, {'ETag': etag}, True
+    m = re.fullmatch(r'/book/show/(\d+)', path)
+    if m and fixtures.author_of(int(m.group(1))) <= fixtures.authors:
+        return 200, fixtures.book_page(int(m.group(1))), HTML, None, True
+    m = re.fullmatch(r'/book/isbn/%s(\d{10})' % ISBN_PREFIX, path)
+    if m:
+        return 302, b'', HTML, {'Location': f'{fixtures.base}/book/show/{int(m.group(1))}'}, True
+    m = re.fullmatch(r'/book/author/Author\s*(\d+)', path)
+    if m and 0 < int(m.group(1)) <= fixtures.authors:
+        return 302, b'', HTML, {'Location': f'{fixtures.base}/author/show/{int(m.group(1))}'}, True
+    if path.startswith('/images/'):
+        return 200, fixtures.image(path), 'image/png', None, True
+    return 404, b'Not found', HTML, None, True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.pause()
+        path = unquote(urlsplit(self.path).path)
+        self.reply(*respond(self.server, path, self.headers.get('If-None-Match')))
+
+    def reply(self, status, body, content_type=HTML, headers=None, count=True):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the plugin hangs up once it has the ld+json of a book page
+            pass
+        if count:
+            self.server.count(status, len(body))
+
+
+class Behaviour:
+    ### The latency, errors and counters shared by both servers ###
+
+    def setup(self, fixtures, latency, jitter, error_rate, seed):
+        self.fixtures = fixtures
+        self.fixtures.base = self.url
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0, 'errors': 0, 'not_modified': 0}
+        self.thread = None
+
+    def delay(self):
+        with self._lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def pause(self):
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+
+    def failure(self):
+        with self._lock:
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.random.choice((503, 429, 500))
+        return 0
+
+    def count(self, status, size):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            if status >= 400:
+                self.stats['errors'] += 1
+            elif status == 304:
+                self.stats['not_modified'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+class FixtureServer(Behaviour, ThreadingHTTPServer):
+    """
+    The stand-in server, run on a background thread by :meth:`start`.
+
+    Args:
+        fixtures (Fixtures): What is served.
+        latency (float): Milliseconds every response is held back.
+        jitter (float): Extra random milliseconds, up to this many.
+        error_rate (float): Share of requests answered with an error status.
+        seed (int): Seed for the jitter and the errors, so runs are repeatable.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, fixtures, port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=1):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', port), Handler)
+        self.setup(fixtures, latency, jitter, error_rate, seed)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def handle_error(self, request, client_address):
+        # clients hanging up mid-response are expected, anything else is reported
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='fixture-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def self_signed_cert(folder):
+    ### A certificate and key for 127.0.0.1 made with the openssl command, for the HTTP/2 server ###
+    cert, key = Path(folder, 'fixture-cert.pem'), Path(folder, 'fixture-key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                    '-keyout', str(key), '-out', str(cert)], check=True, capture_output=True)
+    return str(cert), str(key)
+
+
+class H2FixtureServer(Behaviour):
+    """
+    The stand-in over TLS and HTTP/2, for measuring many requests multiplexed on
+    one connection. Clients have to trust ``certfile``, for httpx by pointing
+    SSL_CERT_FILE at it. Needs the ``h2`` package bundled with the plugin.
+
+    Takes the arguments of :class:`FixtureServer`, plus the certificate and key.
+    """
+
+    def __init__(self, fixtures, certfile, keyfile, port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=1):
+        self.ssl = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.ssl.load_cert_chain(certfile, keyfile)
+        self.ssl.set_alpn_protocols(['h2'])
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.connection, '127.0.0.1', port, ssl=self.ssl))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.setup(fixtures, latency, jitter, error_rate, seed)
+
+    @property
+    def url(self):
+        return f'https://127.0.0.1:{self.port}'
+
+    async def connection(self, reader, writer):
+        import h2.config
+        import h2.connection
+        import h2.events
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding='utf-8'))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        windows = {}
+        tasks = set()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        windows[event.stream_id] = asyncio.Event()
+                        task = self.loop.create_task(self.stream(conn, writer, event.stream_id, dict(event.headers), windows))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    elif isinstance(event, h2.events.WindowUpdated):
+                        for stream_id, window in windows.items():
+                            if event.stream_id in (0, stream_id):
+                                window.set()
+                    elif isinstance(event, h2.events.StreamReset):
+                        window = windows.pop(event.stream_id, None)
+                        if window is not None:
+                            window.set()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+                writer.write(conn.data_to_send())
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def stream(self, conn, writer, stream_id, headers, windows):
+        import h2.exceptions
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        path = unquote(urlsplit(headers.get(':path', '/')).path)
+        status, body, content_type, extra, count = respond(self, path, headers.get('if-none-match'))
+        try:
+            conn.send_headers(stream_id, [(':status', str(status)), ('content-type', content_type),
+                                          ('content-length', str(len(body)))] + list((extra or {}).items()),
+                              end_stream=not body)
+            writer.write(conn.data_to_send())
+            sent = 0
+            while sent < len(body):
+                size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size, len(body) - sent)
+                if size <= 0:
+                    window = windows.get(stream_id)
+                    if window is None:
+                        return
+                    window.clear()
+                    await window.wait()
+                    continue
+                sent += size
+                conn.send_data(stream_id, body[sent - size:sent], end_stream=sent == len(body))
+                writer.write(conn.data_to_send())
+                await writer.drain()
+        except (h2.exceptions.StreamClosedError, h2.exceptions.ProtocolError, ConnectionError):
+            # the plugin resets a book page's stream once it has the ld+json
+            return
+        finally:
+            windows.pop(stream_id, None)
+        if count:
+            self.count(status, len(body))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.loop.run_forever, name='fixture-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Offline Goodreads stand-in for benchmarks')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--authors', type=int, default=1000)
+    parser.add_argument('--books-per-author', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0, help='ms added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra ms')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fixtures', help='directory of recorded author/<id>.html and book/<id>.html pages')
+    args = parser.parse_args(argv)
+    server = FixtureServer(Fixtures(args.authors, args.books_per_author, args.fixtures), args.port,
+                           args.latency, args.jitter, args.error_rate)
+    print(f'Serving {args.authors} authors on {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
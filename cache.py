@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+CACHE_PATH = Path(config_dir).joinpath('plugins/gr_author_notes-cache')
+
+class ResponseCache:
+    """
+    On-disk cache of Goodreads responses, keyed by URL.
+
+    Bodies are stored once under ``objects/`` named by the sha1 of their content,
+    so the same page reached through several URLs (an ``/book/isbn/`` redirect and
+    the ``/book/show/`` page it lands on, for example) only takes up space once.
+    ``index.json`` maps every URL to its body digest, the time it was stored and
+    the ``ETag``/``Last-Modified`` validators the server sent with it.
+
+    The index is kept in least recently used order. When the bodies grow past
+    ``max_size`` bytes the oldest URLs are dropped until it fits again.
+
+    Args:
+        path (Path): Directory holding the cache.
+        ttl (int): Seconds an entry is served without asking the server again.
+        max_size (int): Upper bound in bytes for the stored bodies.
+    """
+
+    SAVE_EVERY = 50
+
+    def __init__(self, path=CACHE_PATH, ttl=7 * 86400, max_size=256 * 1024 * 1024):
+        self.path = Path(path)
+        self.objects = self.path.joinpath('objects')
+        self.index_path = self.path.joinpath('index.json')
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.RLock()
+        self._unsaved = 0
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index = self._load_index()
+        self._refs = {}
+        self.size = 0
+        for entry in self.index.values():
+            self._add_ref(entry)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            return OrderedDict()
+
+    def _object_path(self, digest):
+        return self.objects.joinpath(digest[:2], digest)
+
+    def _add_ref(self, entry):
+        digest = entry['digest']
+        if digest not in self._refs:
+            self.size += entry['size']
+        self._refs[digest] = self._refs.get(digest, 0) + 1
+
+    def _drop_ref(self, entry):
+        digest = entry['digest']
+        self._refs[digest] -= 1
+        if self._refs[digest] <= 0:
+            del self._refs[digest]
+            self.size -= entry['size']
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+
+    def lookup(self, url):
+        ### Return the index entry for url, or None, marking it as recently used ###
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is not None:
+                self.index.move_to_end(url)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored'] < self.ttl
+
+    def read(self, entry):
+        with open(self._object_path(entry['digest']), 'rb') as f:
+            return f.read()
+
+    def validators(self, entry):
+        ### Conditional request headers for revalidating a stale entry ###
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('modified'):
+            headers['If-Modified-Since'] = entry['modified']
+        return headers
+
+    def store(self, url, content, headers=None):
+        headers = headers or {}
+        digest = hashlib.sha1(content).hexdigest()
+        target = self._object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(exist_ok=True)
+            tmp = target.with_name(f'{digest}.{threading.get_ident()}.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, target)
+        entry = {
+            'digest': digest,
+            'size': len(content),
+            'stored': time.time(),
+            'etag': headers.get('ETag', ''),
+            'modified': headers.get('Last-Modified', ''),
+        }
+        with self._lock:
+            old = self.index.pop(url, None)
+            self.index[url] = entry
+            self._add_ref(entry)
+            if old is not None:
+                self._drop_ref(old)
+            self._evict()
+            self._changed()
+        return entry
+
+    def refresh(self, url):
+        ### The server answered 304 Not Modified, so the entry is fresh again ###
+        with self._lock:
+            entry = self.index.get(url)
+            if entry is not None:
+                entry['stored'] = time.time()
+                self._changed()
+            return entry
+
+    def _evict(self):
+        while self.size > self.max_size and len(self.index) > 1:
+            url, entry = self.index.popitem(last=False)
+            self._drop_ref(entry)
+
+    def _changed(self):
+        self._unsaved += 1
+        if self._unsaved >= self.SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            tmp = self.index_path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(list(self.index.items()), f)
+            os.replace(tmp, self.index_path)
+            self._unsaved = 0
+
+    def record(self, outcome):
+        ### Count a lookup as a 'hits', 'misses' or 'revalidated' ###
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated}
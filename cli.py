@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+
+USAGE = '''calibre-debug -r "GR Author Notes" -- --library PATH [options]
+
+Write Goodreads author bios to author notes (or clear them) without the calibre
+GUI. Progress is printed to stdout as one JSON object per line, everything else
+goes to stderr.'''
+
+# Where the JSON progress lines go. main() sends every other print to stderr.
+out = sys.stdout
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='GR Author Notes', usage=USAGE)
+    parser.add_argument('--library', required=True, help='Path to the calibre library folder')
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--all', action='store_true', help='Process every author in the library (the default)')
+    selection.add_argument('--search', metavar='QUERY', help='Process the authors of the books matching a calibre search')
+    selection.add_argument('--ids', metavar='ID,ID,...', help='Process the authors with these ids')
+    selection.add_argument('--resume', action='store_true', help='Carry on with the unfinished run of this library')
+    parser.add_argument('--clear', action='store_true', help='Clear notes instead of writing them')
+    parser.add_argument('--overwrite', action='store_true', help='With --search, also select authors whose notes the plugin has already written')
+    parser.add_argument('--force', action='store_true', help='Regenerate notes even if Goodreads has not changed')
+    parser.add_argument('--workers', type=int, default=None, help='Authors processed at once (default: plugin setting)')
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument('--cache', dest='use_cache', action='store_true', default=None, help='Use the response cache')
+    cache.add_argument('--no-cache', dest='use_cache', action='store_false', help='Download every page')
+    parser.add_argument('--cache-ttl-days', type=int, default=None, help='Days cached pages are used without asking Goodreads')
+    parser.add_argument('--report', metavar='PATH', help='Write where the time of the run went to this JSON file')
+    return parser.parse_args(argv)
+
+def emit(event, **fields):
+    ### One JSON line of progress on stdout ###
+    print(json.dumps({'event': event, **fields}), file=out, flush=True)
+
+def colors():
+    return tuple('#%02x%02x%02x' % tuple(prefs[key][:3]) for key in ('bg_color', 'border_color', 'text_color'))
+
+def select(db, args):
+    ### The (id, data) pairs of the authors to process, from the command line selection ###
+    from calibre_plugins.grauthornotes.authornotes import select_authors # type: ignore
+    if args.ids:
+        try:
+            authorids = [int(aid) for aid in args.ids.split(',') if aid.strip()]
+        except ValueError:
+            raise ValueError(f'Not a list of author ids: {args.ids}') from None
+    elif args.search:
+        authorids = select_authors(db, db.search(args.search), args.clear, args.overwrite)
+    else:
+        return list(db.author_data().items())
+    existing = db.all_field_ids('authors')
+    return list(db.author_data(author_ids=[aid for aid in authorids if aid in existing]).items())
+
+def run(db, authors, clear, force, journal, args):
+    """
+    Process the authors with the same engine and write-behind buffer as the dialog.
+
+    Returns:
+        dict: The totals of the run, also printed as the final ``done`` event.
+    """
+    from calibre_plugins.grauthornotes.engine import create_engine # type: ignore
+    from calibre_plugins.grauthornotes.writer import NoteWriter # type: ignore
+
+    engine = create_engine(db, colors(), clear, args.workers, force, journal, args.use_cache, args.cache_ttl_days)
+    writer = NoteWriter(db, None, clear, prefs['write_chunk'])
+    totals = dict.fromkeys(('imported', 'unchanged', 'skipped', 'failed', 'links'), 0)
+    emit('start', authors=len(authors), clear=clear, force=force, workers=engine.workers)
+    started = time.monotonic()
+    engine.start(authors)
+    interrupted = False
+    try:
+        while True:
+            results = engine.drain()
+            final = engine.finished
+            links, events = writer.apply(results, engine, final)
+            totals['links'] += links
+            for result, state in events:
+                totals[state] += 1
+                emit('author', id=result.author[0], name=result.name, state=state,
+                     link=result.link, done=engine.completed, total=engine.submitted)
+            if final:
+                break
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        interrupted = True
+        engine.cancel()
+        links, events = writer.apply(engine.drain(), engine, final=True)
+        totals['links'] += links
+        for result, state in events:
+            totals[state] += 1
+    finally:
+        # the library is closed right after, so no worker may still be reading from it
+        engine.shutdown(wait=True)
+    if journal is not None:
+        if interrupted:
+            journal.close()
+        else:
+            journal.finish()
+    cache = engine.cache
+    if cache is not None:
+        totals.update(cache_hits=cache.hits, cache_revalidated=cache.revalidated, cache_misses=cache.misses)
+    totals.update(seconds=round(time.monotonic() - started, 3), interrupted=interrupted)
+    stats = engine.stats
+    if stats is not None:
+        totals['timing'] = stats.summary()
+        if args.report:
+            stats.export(args.report)
+        elif prefs['save_reports']:
+            totals['report'] = str(stats.export())
+    emit('done', **totals)
+    return totals
+
+def main(argv):
+    ### Entry point of calibre-debug -r "GR Author Notes" ###
+    global out
+    args = parse_args(argv)
+    out = sys.stdout
+    # find_link, retries and worker errors print as they go, keep them out of the JSON lines
+    with contextlib.redirect_stdout(sys.stderr):
+        return process(args)
+
+def process(args):
+    ### Select, process and record one run, returning the exit status ###
+    from calibre.library import db as open_library # type: ignore
+    from calibre_plugins.grauthornotes.journal import JobJournal # type: ignore
+
+    db = open_library(args.library).new_api
+    try:
+        if args.resume:
+            journal = JobJournal.load(db.library_id)
+            if journal is None:
+                emit('error', message='No unfinished run for this library')
+                return 1
+            existing = db.all_field_ids('authors')
+            authors = list(db.author_data(author_ids=[aid for aid in journal.remaining() if aid in existing]).items())
+            clear, force = journal.clear, journal.force
+        else:
+            try:
+                authors = select(db, args)
+            except ValueError as e:
+                emit('error', message=str(e))
+                return 2
+            clear, force = args.clear, args.force
+            journal = JobJournal.create(db.library_id, [author[0] for author in authors], clear, force)
+        totals = run(db, authors, clear, force, journal, args)
+    finally:
+        db.close()
+    return 130 if totals['interrupted'] else 0
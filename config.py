@@ -4,7 +4,7 @@ __license__   = 'GPL v3'
 __copyright__ = '2011, Kovid Goyal <kovid@kovidgoyal.net>'
 __docformat__ = 'restructuredtext en'
 from pathlib import Path
-from qt.core import QWidget, QGridLayout, QLabel, QColorDialog, QColor, QPushButton, QCheckBox, QGroupBox, QHBoxLayout, QVBoxLayout, QLineEdit, Qt
+from qt.core import QWidget, QGridLayout, QLabel, QColorDialog, QColor, QPushButton, QCheckBox, QGroupBox, QHBoxLayout, QVBoxLayout, QLineEdit, QSpinBox, QComboBox, Qt
 
 from calibre.utils.config import JSONConfig
 
@@ -44,6 +44,25 @@ prefs.defaults['only_confirmed'] = False
 prefs.defaults['overwrite_links'] = False
 prefs.defaults['translate'] = False
 prefs.defaults['language'] = ''
+prefs.defaults['translator'] = 'google'
+prefs.defaults['libretranslate_url'] = 'http://localhost:5000'
+prefs.defaults['libretranslate_key'] = ''
+prefs.defaults['workers'] = 4
+prefs.defaults['per_host_limit'] = 2
+prefs.defaults['http2'] = True
+prefs.defaults['pool_size'] = 8
+prefs.defaults['use_cache'] = True
+prefs.defaults['image_resources'] = True
+prefs.defaults['image_max_size'] = 200
+prefs.defaults['image_quality'] = 80
+prefs.defaults['cache_ttl_days'] = 7
+prefs.defaults['cache_size_mb'] = 256
+prefs.defaults['write_chunk'] = 50
+prefs.defaults['request_rate'] = 5
+prefs.defaults['save_reports'] = False
+prefs.defaults['libs_from_zip'] = True
+prefs.defaults['async_pipeline'] = False
+prefs.defaults['async_authors'] = 32
 
 class ConfigWidget(QWidget):
 
@@ -59,6 +78,25 @@ class ConfigWidget(QWidget):
         overwrite_links = prefs['overwrite_links']
         language = prefs['language']
         translate = prefs['translate']
+        translator = prefs['translator']
+        libretranslate_url = prefs['libretranslate_url']
+        libretranslate_key = prefs['libretranslate_key']
+        workers = prefs['workers']
+        per_host_limit = prefs['per_host_limit']
+        http2 = prefs['http2']
+        pool_size = prefs['pool_size']
+        use_cache = prefs['use_cache']
+        cache_ttl_days = prefs['cache_ttl_days']
+        cache_size_mb = prefs['cache_size_mb']
+        write_chunk = prefs['write_chunk']
+        request_rate = prefs['request_rate']
+        save_reports = prefs['save_reports']
+        libs_from_zip = prefs['libs_from_zip']
+        async_pipeline = prefs['async_pipeline']
+        async_authors = prefs['async_authors']
+        image_resources = prefs['image_resources']
+        image_max_size = prefs['image_max_size']
+        image_quality = prefs['image_quality']
         bgcolor = QColor()
         bordercolor = QColor()
         textcolor = QColor()
@@ -148,11 +186,130 @@ class ConfigWidget(QWidget):
         self.lang_layout.addWidget(self.language)
         self.lang_layout.addWidget(self.lang_label_ico)
         self.transbox.addWidget(self.langwidget)
+
+        # Translator
+        self.translatorwidget = QWidget()
+        self.translator_layout = QGridLayout(self.translatorwidget)
+        self.translator_layout.setContentsMargins(0,0,0,0)
+        self.translator_label = QLabel(_('Translate with'))
+        self.translator_layout.addWidget(self.translator_label,0,0,Qt.AlignRight)
+        self.translator = QComboBox()
+        self.translator.addItem(_('Google Translate'), 'google')
+        self.translator.addItem(_('LibreTranslate server'), 'libretranslate')
+        self.translator.addItem(_('Dictionary file only'), 'dictionary')
+        self.translator.setItemData(2, _('Translations listed in gr_author_notes-dictionary.json in the calibre plugins folder, such as the field labels. Everything else is left as it is.'), Qt.ItemDataRole.ToolTipRole)
+        self.translator.setCurrentIndex(max(0, self.translator.findData(translator)))
+        self.translator_layout.addWidget(self.translator,0,1)
+        self.libretranslate_url_label = QLabel(_('Server URL'))
+        self.translator_layout.addWidget(self.libretranslate_url_label,1,0,Qt.AlignRight)
+        self.libretranslate_url = QLineEdit(libretranslate_url)
+        self.translator_layout.addWidget(self.libretranslate_url,1,1)
+        self.libretranslate_key_label = QLabel(_('API key'))
+        self.translator_layout.addWidget(self.libretranslate_key_label,2,0,Qt.AlignRight)
+        self.libretranslate_key = QLineEdit(libretranslate_key)
+        self.translator_layout.addWidget(self.libretranslate_key,2,1)
+        self.transbox.addWidget(self.translatorwidget)
+        self.translator.currentIndexChanged.connect(self.update_translator)
+        self.update_translator()
+
+        # Performance
+        self.performance = QGroupBox(_('Performance'))
+        self.perfLayout = QGridLayout(self.performance)
+        self.workers_label = QLabel(_('Authors processed at once:'))
+        self.perfLayout.addWidget(self.workers_label,0,0,Qt.AlignRight)
+        self.workers = QSpinBox()
+        self.workers.setRange(1, 32)
+        self.workers.setValue(workers)
+        self.perfLayout.addWidget(self.workers,0,1,Qt.AlignLeft)
+        self.per_host_label = QLabel(_('Simultaneous requests per site:'))
+        self.perfLayout.addWidget(self.per_host_label,1,0,Qt.AlignRight)
+        self.per_host_limit = QSpinBox()
+        self.per_host_limit.setRange(1, 16)
+        self.per_host_limit.setValue(per_host_limit)
+        self.perfLayout.addWidget(self.per_host_limit,1,1,Qt.AlignLeft)
+        self.pool_size_label = QLabel(_('Open connections kept for reuse:'))
+        self.perfLayout.addWidget(self.pool_size_label,2,0,Qt.AlignRight)
+        self.pool_size = QSpinBox()
+        self.pool_size.setRange(1, 64)
+        self.pool_size.setValue(pool_size)
+        self.perfLayout.addWidget(self.pool_size,2,1,Qt.AlignLeft)
+        self.http2_cb = QCheckBox(_('Use HTTP/2 when the site supports it'))
+        self.http2_cb.setChecked(http2)
+        self.perfLayout.addWidget(self.http2_cb,3,0,1,2)
+
+        # Cache
+        self.use_cache_cb = QCheckBox(_('Keep downloaded Goodreads pages in a cache'))
+        self.use_cache_cb.setChecked(use_cache)
+        self.perfLayout.addWidget(self.use_cache_cb,4,0,1,2)
+        self.cache_ttl_label = QLabel(_('Refresh cached pages after (days):'))
+        self.perfLayout.addWidget(self.cache_ttl_label,5,0,Qt.AlignRight)
+        self.cache_ttl = QSpinBox()
+        self.cache_ttl.setRange(0, 365)
+        self.cache_ttl.setValue(cache_ttl_days)
+        self.perfLayout.addWidget(self.cache_ttl,5,1,Qt.AlignLeft)
+        self.cache_size_label = QLabel(_('Maximum cache size (MB):'))
+        self.perfLayout.addWidget(self.cache_size_label,6,0,Qt.AlignRight)
+        self.cache_size = QSpinBox()
+        self.cache_size.setRange(16, 16384)
+        self.cache_size.setValue(cache_size_mb)
+        self.perfLayout.addWidget(self.cache_size,6,1,Qt.AlignLeft)
+        self.use_cache_cb.clicked.connect(self.update_cache)
+        self.update_cache()
+        self.write_chunk_label = QLabel(_('Notes written to the library at once:'))
+        self.perfLayout.addWidget(self.write_chunk_label,7,0,Qt.AlignRight)
+        self.write_chunk = QSpinBox()
+        self.write_chunk.setRange(1, 1000)
+        self.write_chunk.setValue(write_chunk)
+        self.perfLayout.addWidget(self.write_chunk,7,1,Qt.AlignLeft)
+        self.request_rate_label = QLabel(_('Requests per second per site:'))
+        self.perfLayout.addWidget(self.request_rate_label,8,0,Qt.AlignRight)
+        self.request_rate = QSpinBox()
+        self.request_rate.setRange(1, 50)
+        self.request_rate.setValue(request_rate)
+        self.perfLayout.addWidget(self.request_rate,8,1,Qt.AlignLeft)
+        self.save_reports_cb = QCheckBox(_('Save a timing report of every run as JSON'))
+        self.save_reports_cb.setChecked(save_reports)
+        self.perfLayout.addWidget(self.save_reports_cb,9,0,1,2)
+        self.libs_from_zip_cb = QCheckBox(_('Load the bundled network libraries from the plugin file instead of unpacking them'))
+        self.libs_from_zip_cb.setChecked(libs_from_zip)
+        self.perfLayout.addWidget(self.libs_from_zip_cb,10,0,1,2)
+        self.async_pipeline_cb = QCheckBox(_('Download with one asyncio pipeline instead of a thread per author'))
+        self.async_pipeline_cb.setChecked(async_pipeline)
+        self.perfLayout.addWidget(self.async_pipeline_cb,11,0,1,2)
+        self.async_authors_label = QLabel(_('Authors in progress at once in the pipeline:'))
+        self.perfLayout.addWidget(self.async_authors_label,12,0,Qt.AlignRight)
+        self.async_authors = QSpinBox()
+        self.async_authors.setRange(1, 512)
+        self.async_authors.setValue(async_authors)
+        self.perfLayout.addWidget(self.async_authors,12,1,Qt.AlignLeft)
+        self.async_pipeline_cb.clicked.connect(self.update_async)
+        self.update_async()
+
+        # Author Images
+        self.images = QGroupBox(_('Author Images'))
+        self.imagesLayout = QGridLayout(self.images)
+        self.image_size_label = QLabel(_('Maximum image size (pixels):'))
+        self.imagesLayout.addWidget(self.image_size_label,0,0,Qt.AlignRight)
+        self.image_max_size = QSpinBox()
+        self.image_max_size.setRange(32, 2048)
+        self.image_max_size.setValue(image_max_size)
+        self.imagesLayout.addWidget(self.image_max_size,0,1,Qt.AlignLeft)
+        self.image_quality_label = QLabel(_('JPEG quality:'))
+        self.imagesLayout.addWidget(self.image_quality_label,1,0,Qt.AlignRight)
+        self.image_quality = QSpinBox()
+        self.image_quality.setRange(10, 100)
+        self.image_quality.setValue(image_quality)
+        self.imagesLayout.addWidget(self.image_quality,1,1,Qt.AlignLeft)
+        self.image_resources_cb = QCheckBox(_('Store each image once as a note resource instead of inside every note'))
+        self.image_resources_cb.setChecked(image_resources)
+        self.imagesLayout.addWidget(self.image_resources_cb,2,0,1,2)
         
         
         self.l.addWidget(self.colors,0,0,1,3,Qt.AlignLeft)
         self.l.addWidget(self.translation,0,3,1,1,Qt.AlignRight)
         self.l.addWidget(self.author_links,1,0,1,5,Qt.AlignCenter)
+        self.l.addWidget(self.performance,2,0,1,5,Qt.AlignCenter)
+        self.l.addWidget(self.images,3,0,1,5,Qt.AlignCenter)
         
 
     def save_settings(self):
@@ -164,10 +321,42 @@ class ConfigWidget(QWidget):
         prefs['only_confirmed'] = self.only_confirmed_cb.isChecked()
         prefs['language'] = self.language.text()
         prefs['translate'] = self.translate_cb.isChecked()
+        prefs['translator'] = self.translator.currentData()
+        prefs['libretranslate_url'] = self.libretranslate_url.text().strip() or prefs.defaults['libretranslate_url']
+        prefs['libretranslate_key'] = self.libretranslate_key.text().strip()
+        prefs['workers'] = self.workers.value()
+        prefs['per_host_limit'] = self.per_host_limit.value()
+        prefs['http2'] = self.http2_cb.isChecked()
+        prefs['pool_size'] = self.pool_size.value()
+        prefs['use_cache'] = self.use_cache_cb.isChecked()
+        prefs['cache_ttl_days'] = self.cache_ttl.value()
+        prefs['cache_size_mb'] = self.cache_size.value()
+        prefs['write_chunk'] = self.write_chunk.value()
+        prefs['request_rate'] = self.request_rate.value()
+        prefs['save_reports'] = self.save_reports_cb.isChecked()
+        prefs['libs_from_zip'] = self.libs_from_zip_cb.isChecked()
+        prefs['async_pipeline'] = self.async_pipeline_cb.isChecked()
+        prefs['async_authors'] = self.async_authors.value()
+        prefs['image_resources'] = self.image_resources_cb.isChecked()
+        prefs['image_max_size'] = self.image_max_size.value()
+        prefs['image_quality'] = self.image_quality.value()
     
     def update_links(self):
         self.overwrite_links_cb.setEnabled(self.update_links_cb.isChecked())
 
+    def update_translator(self):
+        libre = self.translator.currentData() == 'libretranslate'
+        self.libretranslate_url.setEnabled(libre)
+        self.libretranslate_key.setEnabled(libre)
+
+    def update_cache(self):
+        self.cache_ttl.setEnabled(self.use_cache_cb.isChecked())
+        self.cache_size.setEnabled(self.use_cache_cb.isChecked())
+
+    def update_async(self):
+        self.async_authors.setEnabled(self.async_pipeline_cb.isChecked())
+        self.workers.setEnabled(not self.async_pipeline_cb.isChecked())
+
     def select_bg_color(self):
         color = QColorDialog.getColor()
         colorstr = " background-color : "
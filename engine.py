@@ -0,0 +1,345 @@
+import asyncio
+import contextlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+from calibre_plugins.grauthornotes import images, network, timing, trans # type: ignore
+from calibre_plugins.grauthornotes.authornotes import LinkResolver, find_link, find_link_async, build_note, build_note_async # type: ignore
+from calibre_plugins.grauthornotes.fingerprints import UNCHANGED, FingerprintIndex, page_fingerprint # type: ignore
+
+# The thread closing the last run, while its workers finish what they were doing
+_closing = None
+
+def close_run_later(close, wait=False):
+    global _closing
+    if wait:
+        close()
+        return
+    _closing = threading.Thread(target=close, name='grauthornotes-close')
+    _closing.start()
+
+def wait_closed():
+    ### Let the previous run close before a new one opens the shared session, cache and stores ###
+    closing = _closing
+    if closing is not None:
+        closing.join()
+
+
+class AuthorResult:
+    """
+    The outcome of processing a single author on a worker thread.
+
+    Nothing in here has been written to the database yet. ``new_link`` is set
+    when a Goodreads link was found that still has to be stored with
+    ``db.set_link_map`` and ``html`` holds the note waiting for ``db.import_note``.
+    ``unchanged`` is set instead of ``html`` when the author's Goodreads page has
+    not changed since the existing note was generated from it.
+    """
+
+    __slots__ = ('author', 'link', 'new_link', 'html', 'ignored', 'unchanged', 'error')
+
+    def __init__(self, author, link='', new_link=False, html='', ignored=False, unchanged=False, error=None):
+        self.author = author
+        self.link = link
+        self.new_link = new_link
+        self.html = html
+        self.ignored = ignored
+        self.unchanged = unchanged
+        self.error = error
+
+    @property
+    def name(self):
+        return self.author[1].get('name')
+
+
+class AuthorEngine:
+    """
+    Fetch and render author notes on a pool of worker threads.
+
+    The engine never writes to the database. Finished authors are queued as
+    :class:`AuthorResult` objects and the owner (normally the progress dialog
+    on the GUI thread) collects them with :meth:`drain` and applies the writes.
+
+    Args:
+        db (object): The calibre database (``db.new_api``), only read from here.
+        colors (tuple): The background, border and text colors as html strings.
+        clear (bool): Whether notes are being cleared instead of generated.
+        workers (int): Number of authors processed at the same time.
+        force (bool): Regenerate notes even for authors whose page has not changed.
+        journal (JobJournal): Where the progress of each author is recorded, if anywhere.
+        use_cache (bool): Use the response cache. None follows the plugin settings.
+        cache_ttl_days (int): Days cached pages are used without asking Goodreads.
+                              None follows the plugin settings.
+    """
+
+    def __init__(self, db, colors, clear=False, workers=None, force=False, journal=None, use_cache=None, cache_ttl_days=None):
+        self.db = db
+        self.bgcolor, self.bordercolor, self.textcolor = colors
+        self.clear = clear
+        self.force = force
+        self.journal = journal
+        self.use_cache = use_cache
+        self.cache_ttl_days = cache_ttl_days
+        self.workers = max(1, int(workers or prefs['workers']))
+        self.results = queue.Queue()
+        self.submitted = 0
+        self.completed = 0
+        self.executor = None
+        self.cache = None
+        self.resolver = LinkResolver()
+        self.fingerprints = None
+        self.stats = None
+
+    def start(self, authors):
+        self.open_run()
+        network.open_session()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='grauthornotes')
+        for author in authors:
+            future = self.executor.submit(self.process, author)
+            future.add_done_callback(self._done)
+            self.submitted += 1
+
+    def open_run(self):
+        ### Set up the limits, caches and stores shared by every author of the run ###
+        wait_closed()
+        self.stats = timing.open_stats()
+        network.limiter.reset(prefs['per_host_limit'])
+        network.rates.reset(prefs['request_rate'])
+        self.cache = network.open_cache(self.use_cache, self.cache_ttl_days)
+        images.open_store()
+        self.fingerprints = FingerprintIndex(self.db.library_id)
+        if prefs['translate'] and not self.clear:
+            trans.open_translation()
+
+    def _done(self, future):
+        if future.cancelled():
+            return
+        self.results.put(future.result())
+
+    def process(self, author):
+        if author[1].get('name') == 'Unknown':
+            return AuthorResult(author, ignored=True)
+        if self.clear:
+            return AuthorResult(author)
+        # a link found before a later step fails is still stored
+        author_link = author[1].get('link')
+        new_link = False
+        try:
+            if author_link == '' and prefs['update_links'] == True:
+                author_link = find_link(author, self.db, self.resolver)
+                new_link = bool(author_link)
+                if new_link:
+                    self.record(author[0], 'linked')
+            html = build_note(author, self.bgcolor, self.bordercolor, self.textcolor, author_link,
+                              lambda url, page: self.unchanged(author[0], url, page))
+            if html is UNCHANGED:
+                return AuthorResult(author, author_link, new_link, unchanged=True)
+            if html:
+                self.record(author[0], 'rendered')
+            return AuthorResult(author, author_link, new_link, html)
+        except Exception as e:
+            print(f"Engine error for {author[1].get('name')}: {e}")
+            return AuthorResult(author, author_link, new_link, error=e)
+
+    def settings(self):
+        ### Everything besides the page that changes how a note comes out ###
+        return [self.bgcolor, self.bordercolor, self.textcolor, prefs['translate'], prefs['language'],
+                prefs['image_resources'], prefs['image_max_size'], prefs['image_quality']] + \
+               ([prefs['translator']] if prefs['translate'] else [])
+
+    def record(self, author_id, state):
+        if self.journal is not None:
+            self.journal.record(author_id, state)
+
+    def unchanged(self, author_id, url, page):
+        self.record(author_id, 'fetched')
+        content = page_fingerprint(page, self.settings())
+        self.fingerprints.stage(author_id, url, content)
+        if self.force:
+            return False
+        with timing.stage('db_read'):
+            note = self.db.notes_for('authors', author_id)
+        return self.fingerprints.is_unchanged(author_id, url, content, note)
+
+    def drain(self, limit=None):
+        ### Return the results finished since the last call, at most limit of them ###
+        done = []
+        while limit is None or len(done) < limit:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.completed += len(done)
+        return done
+
+    @property
+    def finished(self):
+        return self.completed >= self.submitted
+
+    def cancel(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=False):
+        """
+        Stop the workers and close what the run shares once the last of them is done.
+
+        Workers still busy with an author would otherwise reopen the session, cache,
+        image store and translation backend after they were closed, and change the
+        fingerprint index while it is saved. Waiting on them can take a while after a
+        cancel, so unless ``wait`` is set it happens on a thread of its own and the
+        next run waits for it in :meth:`open_run`.
+        """
+        executor, self.executor = self.executor, None
+
+        def close():
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+            self.close_run()
+        close_run_later(close, wait)
+
+    def close_run(self):
+        network.close_cache()
+        network.close_session()
+        images.close_store()
+        trans.close_translation()
+        if self.fingerprints is not None:
+            self.fingerprints.save()
+        timing.close_stats()
+
+
+class EventLoop:
+    ### An asyncio event loop running on its own daemon thread ###
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, name='grauthornotes-loop', daemon=True)
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def submit(self, coro):
+        ### Schedule a coroutine from any thread, returning a concurrent.futures.Future ###
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=10):
+        with contextlib.suppress(Exception):
+            self.submit(self.loop.shutdown_default_executor()).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+
+class AsyncAuthorEngine(AuthorEngine):
+    """
+    The :class:`AuthorEngine` as one asyncio pipeline instead of a thread per author.
+
+    Every author is a task on an event loop running on its own thread. At most
+    ``workers`` of them are in progress at once. Downloads go through one
+    :class:`network.AsyncSession`, so they share its connections and limits. A
+    host that answers over HTTP/2 gets many requests in flight as streams of one
+    connection instead of the per host limit, paced by the request rate. Each
+    author fetches its image and its translation side by side. Results are queued exactly as the threaded engine
+    does, so the owner only sees finished authors through :meth:`drain`.
+    """
+
+    def __init__(self, db, colors, clear=False, workers=None, force=False, journal=None, use_cache=None, cache_ttl_days=None):
+        super().__init__(db, colors, clear, workers or prefs['async_authors'], force, journal, use_cache, cache_ttl_days)
+        self.loop = None
+        self.session = None
+        self.future = None
+        self.task = None
+
+    def start(self, authors):
+        self.open_run()
+        self.submitted = len(authors)
+        self.loop = EventLoop().start()
+        self.future = self.loop.submit(self.run(authors))
+        self.future.add_done_callback(self._run_done)
+
+    def _run_done(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f'Pipeline error: {future.exception()!r}')
+
+    @property
+    def finished(self):
+        # the run can also end without a result for every author, when the pipeline itself fails
+        if self.completed >= self.submitted:
+            return True
+        return self.future is not None and self.future.done() and self.results.empty()
+
+    async def run(self, authors):
+        self.task = asyncio.current_task()
+        self.session = network.AsyncSession(http2=prefs['http2'], max_connections=prefs['pool_size'],
+                                             per_host=prefs['per_host_limit'])
+        slots = asyncio.Semaphore(self.workers)
+
+        async def one(author):
+            async with slots:
+                self.results.put(await self.process_async(author))
+        try:
+            await asyncio.gather(*(one(author) for author in authors))
+        finally:
+            await self.session.close()
+
+    async def process_async(self, author):
+        if author[1].get('name') == 'Unknown':
+            return AuthorResult(author, ignored=True)
+        if self.clear:
+            return AuthorResult(author)
+        author_link = author[1].get('link')
+        new_link = False
+        try:
+            if author_link == '' and prefs['update_links'] == True:
+                author_link = await find_link_async(author, self.db, self.resolver, self.session)
+                new_link = bool(author_link)
+                if new_link:
+                    self.record(author[0], 'linked')
+            html = await build_note_async(self.session, author, self.bgcolor, self.bordercolor, self.textcolor, author_link,
+                                          lambda url, page: self.unchanged(author[0], url, page))
+            if html is UNCHANGED:
+                return AuthorResult(author, author_link, new_link, unchanged=True)
+            if html:
+                self.record(author[0], 'rendered')
+            return AuthorResult(author, author_link, new_link, html)
+        except Exception as e:
+            print(f"Engine error for {author[1].get('name')}: {e}")
+            return AuthorResult(author, author_link, new_link, error=e)
+
+    async def stop_run(self):
+        task = self.task
+        if task is not None and not task.done():
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+
+    def cancel(self):
+        if self.loop is not None:
+            self.loop.submit(self.stop_run())
+
+    def shutdown(self, wait=False):
+        ### Stop the pipeline, then close the run once the threads it handed work to are done too ###
+        loop, self.loop = self.loop, None
+
+        def close():
+            if loop is not None:
+                with contextlib.suppress(Exception):
+                    loop.submit(self.stop_run()).result()
+                # translations run on the loop's default executor, wait for them as well
+                loop.stop(timeout=None)
+            self.close_run()
+        close_run_later(close, wait)
+
+
+def create_engine(*args, **kwargs):
+    ### The engine the settings ask for, taking AuthorEngine's arguments ###
+    engine = AsyncAuthorEngine if prefs['async_pipeline'] else AuthorEngine
+    return engine(*args, **kwargs)
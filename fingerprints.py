@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+# One index per library, author ids are only unique within a library
+FINGERPRINTS_DIR = Path(config_dir).joinpath('plugins/gr_author_notes-fingerprints')
+
+# Returned by build_note() instead of html when the note would come out the same as last time
+UNCHANGED = object()
+
+def digest(*parts):
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def page_fingerprint(page, settings):
+    ### Hash of everything on the author page that ends up in the note, plus the settings used to render it ###
+    return digest(page.name, page.bio, page.titles, page.items, page.born, page.image_url, settings)
+
+
+class FingerprintIndex:
+    """
+    What each author's note was last generated from.
+
+    For every author id the index keeps the Goodreads URL the note came from, the
+    :func:`page_fingerprint` of the page and the hash of the note as calibre stored
+    it. When a later run fetches the same page and none of that has changed (and the
+    note has not been edited or cleared in calibre since), rendering, translation and
+    the import are all skipped.
+
+    Workers call :meth:`stage` while building a note. The entry only replaces the old
+    one in :meth:`commit`, after the note has been written to the database.
+
+    Args:
+        library_id (str): The ``db.library_id`` of the library the author ids belong to.
+        path (str): Where the index is kept. Defaults to a file named after the library.
+    """
+
+    def __init__(self, library_id, path=None):
+        self.library_id = library_id
+        self.path = Path(path) if path is not None else FINGERPRINTS_DIR.joinpath(f'{library_id}.json')
+        self.unchanged = 0
+        self.pending = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.authors = json.load(f)
+        except (OSError, ValueError):
+            self.authors = {}
+
+    def is_unchanged(self, author_id, url, content, note):
+        with self._lock:
+            entry = self.authors.get(str(author_id))
+            same = (entry is not None and entry['url'] == url and entry['content'] == content
+                    and bool(note) and entry['note'] == digest(note))
+            if same:
+                self.unchanged += 1
+            return same
+
+    def stage(self, author_id, url, content):
+        with self._lock:
+            self.pending[str(author_id)] = (url, content)
+
+    def commit(self, author_id, note):
+        ### Record the note calibre now holds for an author whose note was just imported ###
+        with self._lock:
+            staged = self.pending.pop(str(author_id), None)
+            if staged is not None:
+                url, content = staged
+                self.authors[str(author_id)] = {'url': url, 'content': content, 'note': digest(note)}
+
+    def generated(self, author_id):
+        ### Whether the author's note was written by the plugin ###
+        with self._lock:
+            return str(author_id) in self.authors
+
+    def mark(self, author_id):
+        # For notes the plugin wrote before this index existed. Nothing in the entry
+        # matches a page, so the next refresh of the author still renders its note.
+        with self._lock:
+            self.authors.setdefault(str(author_id), {'url': '', 'content': '', 'note': ''})
+
+    def forget(self, author_id):
+        with self._lock:
+            self.pending.pop(str(author_id), None)
+            self.authors.pop(str(author_id), None)
+
+    def save(self):
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.authors, f)
+            os.replace(tmp, self.path)
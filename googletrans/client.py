@@ -5,6 +5,7 @@ A Translation module.
 You can translate text using this module.
 """
 import random
+import threading
 import typing
 import re
 
@@ -23,6 +24,40 @@ from googletrans.models import Translated, Detected
 
 EXCLUDES = ('en', 'ca', 'fr')
 
+# httpx clients shared by every Translator without proxies, by (http2, user agent, timeout)
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def shared_client(http2=True, user_agent=DEFAULT_USER_AGENT, timeout=None):
+    """Return the process-wide client for these settings, creating it on first use
+    so connections to Google are kept alive between Translator instances."""
+    key = (http2, user_agent, repr(timeout))
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _CLIENTS[key] = httpx.Client(http2=http2)
+            client.headers.update({
+                'User-Agent': user_agent,
+            })
+            if timeout is not None:
+                client.timeout = timeout
+        return client
+
+
+class StatusError(Exception):
+    """Raised by a Translator with raise_exception for a status other than 200.
+
+    :param response: the response Google answered with
+    """
+
+    def __init__(self, response, service_urls):
+        super().__init__('Unexpected status code "{}" from {}'.format(
+            response.status_code, service_urls))
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+
 
 class Translator:
     """Google Translate ajax API implementation class
@@ -50,24 +85,30 @@ class Translator:
                     For example ``{'http': 'foo.bar:3128', 'http://host.name': 'foo.bar:4012'}``
     :param raise_exception: if `True` then raise exception if smth will go wrong
     :type raise_exception: boolean
+
+    :param text_only: if `True` then only ask Google for the translated text, leaving out the
+                      dictionary, examples and other extras, and skip parsing them
+    :type text_only: boolean
     """
 
     def __init__(self, service_urls=DEFAULT_CLIENT_SERVICE_URLS, user_agent=DEFAULT_USER_AGENT,
                  raise_exception=DEFAULT_RAISE_EXCEPTION,
                  proxies: typing.Dict[str, httpcore.SyncHTTPTransport] = None,
                  timeout: Timeout = None,
-                 http2=True):
+                 http2=True, text_only=False):
 
-        self.client = httpx.Client(http2=http2)
-        if proxies is not None:  # pragma: nocover
+        if proxies is None:
+            self.client = shared_client(http2, user_agent, timeout)
+        else:  # pragma: nocover
+            self.client = httpx.Client(http2=http2)
             self.client.proxies = proxies
 
-        self.client.headers.update({
-            'User-Agent': user_agent,
-        })
+            self.client.headers.update({
+                'User-Agent': user_agent,
+            })
 
-        if timeout is not None:
-            self.client.timeout = timeout
+            if timeout is not None:
+                self.client.timeout = timeout
 
         if (service_urls is not None):
             #default way of working: use the defined values from user app
@@ -90,6 +131,7 @@ class Translator:
                 client=self.client, host=self.service_urls[0])
 
         self.raise_exception = raise_exception
+        self.text_only = text_only
 
     def _pick_service_url(self):
         if len(self.service_urls) == 1:
@@ -102,7 +144,7 @@ class Translator:
             token = self.token_acquirer.do(text)
 
         params = utils.build_params(client=self.client_type, query=text, src=src, dest=dest,
-                                    token=token, override=override)
+                                    token=token, override=override, text_only=self.text_only)
 
         url = urls.TRANSLATE.format(host=self._pick_service_url())
         r = self.client.get(url, params=params)
@@ -112,8 +154,7 @@ class Translator:
             return data, r
 
         if self.raise_exception:
-            raise Exception('Unexpected status code "{}" from {}'.format(
-                r.status_code, self.service_urls))
+            raise StatusError(r, self.service_urls)
 
         DUMMY_DATA[0][0][0] = text
         return DUMMY_DATA, r
@@ -212,7 +253,7 @@ class Translator:
         # this code will be updated when the format is changed.
         translated = ''.join([d[0] if d[0] else '' for d in data[0]])
 
-        extra_data = self._parse_extra_data(data)
+        extra_data = None if self.text_only else self._parse_extra_data(data)
 
         # actual source language that will be recognized by Google Translator when the
         # src passed is equal to auto.
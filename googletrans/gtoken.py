@@ -2,6 +2,7 @@
 import ast
 import math
 import re
+import threading
 import time
 
 import httpx
@@ -9,6 +10,12 @@ import httpx
 from googletrans.utils import rshift
 
 
+# TKK seeds by host, shared by every TokenAcquirer in the process: host -> (tkk, hour it is for).
+# Google rotates the seed on the hour, so a seed is only used within the hour it was fetched in.
+_TKK_CACHE = {}
+_TKK_LOCK = threading.Lock()
+
+
 class TokenAcquirer:
     """Google Translate API token generator
 
@@ -45,12 +52,31 @@ class TokenAcquirer:
 
     def _update(self):
         """update tkk
+
+        The seed is fetched at most once per clock hour per host for the whole
+        process, however many Translators there are and however many threads use them.
         """
-        # we don't need to update the base TKK value when it is still valid
-        now = math.floor(int(time.time() * 1000) / 3600000.0)
-        if self.tkk and int(self.tkk.split('.')[0]) == now:
+        now = time.time()
+        current = int(now // 3600)
+        cached = _TKK_CACHE.get(self.host)
+        if cached is not None and cached[1] == current:
+            self.tkk = cached[0]
             return
-
+        with _TKK_LOCK:
+            # another thread may have fetched it while this one waited
+            cached = _TKK_CACHE.get(self.host)
+            if cached is not None and cached[1] == current:
+                self.tkk = cached[0]
+                return
+            # we don't need to update the base TKK value when it is still valid
+            hour = math.floor(int(now * 1000) / 3600000.0)
+            if not (self.tkk and int(self.tkk.split('.')[0]) == hour):
+                self._fetch()
+            _TKK_CACHE[self.host] = (self.tkk, current)
+
+    def _fetch(self):
+        """fetch tkk from the translate page
+        """
         r = self.client.get(self.host)
 
         raw_tkk = self.RE_TKK.search(r.text)
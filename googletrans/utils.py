@@ -1,9 +1,12 @@
 """A conversion module for googletrans"""
 import json
-import re
 
 
-def build_params(client,query, src, dest, token, override):
+# Only the translated text, without the dictionary, examples, pronunciation...
+TEXT_ONLY_DT = ['t']
+
+
+def build_params(client,query, src, dest, token, override, text_only=False):
     params = {
         'client': client,
         'sl': src,
@@ -19,6 +22,9 @@ def build_params(client,query, src, dest, token, override):
         'q': query,
     }
 
+    if text_only:
+        params['dt'] = TEXT_ONLY_DT
+
     if override is not None:
         for key, value in get_items(override):
             params[key] = value
@@ -27,36 +33,35 @@ def build_params(client,query, src, dest, token, override):
 
 
 def legacy_format_json(original):
-    # save state
-    states = []
-    text = original
-
-    # save position for double-quoted texts
-    for i, pos in enumerate(re.finditer('"', text)):
-        # pos.start() is a double-quote
-        p = pos.start() + 1
-        if i % 2 == 0:
-            nxt = text.find('"', p)
-            states.append((p, text[p:nxt]))
-
-    # replace all wiered characters in text
-    while text.find(',,') > -1:
-        text = text.replace(',,', ',null,')
-    while text.find('[,') > -1:
-        text = text.replace('[,', '[null,')
-
-    # recover state
-    for i, pos in enumerate(re.finditer('"', text)):
-        p = pos.start() + 1
-        if i % 2 == 0:
-            j = int(i / 2)
-            nxt = text.find('"', p)
-            # replacing a portion of a string
-            # use slicing to extract those parts of the original string to be kept
-            text = text[:p] + states[j][1] + text[nxt:]
-
-    converted = json.loads(text)
-    return converted
+    """Decode a JavaScript array literal with holes (``[,1,,2]``) by filling
+    the holes with null in a single pass over the text."""
+    out = []
+    start = 0
+    in_string = False
+    escaped = False
+    # the last significant character outside of strings
+    last = ''
+    for i, char in enumerate(original):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == ',':
+            if last == ',' or last == '[':
+                out.append(original[start:i])
+                out.append('null')
+                start = i
+        elif char.isspace():
+            continue
+        last = char
+    out.append(original[start:])
+    return json.loads(''.join(out))
 
 
 def get_items(dict_object):
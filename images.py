@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+from calibre_plugins.grauthornotes import network # type: ignore
+
+IMAGES_PATH = Path(config_dir).joinpath('plugins/gr_author_notes-images')
+PLACEHOLDER = 'nophoto'
+
+def is_placeholder(url):
+    ### Goodreads serves the same "no photo" silhouette, in several sizes, for authors without a portrait ###
+    return PLACEHOLDER in url
+
+def shrink(data, max_size, quality):
+    """
+    Downscale an image so neither side is over max_size and recompress it as JPEG.
+
+    Returns the original bytes if calibre cannot decode the image.
+    """
+    try:
+        from calibre.utils.img import scale_image # type: ignore
+        width, height, scaled = scale_image(data, width=max_size, height=max_size, compression_quality=quality)
+        return scaled if len(scaled) < len(data) else data
+    except Exception as e:
+        print(f"Image scale error: {e}")
+        return data
+
+
+class ImageStore:
+    """
+    Author portraits, downloaded once and kept thumbnailed on disk.
+
+    Images are stored as ``<sha1 of the download>-<max size>.jpg`` so portraits shared
+    by several authors (and the Goodreads placeholder, which is reached through many
+    URLs) exist once. ``index.json`` maps each image URL to that hash, so a URL seen
+    in an earlier run is never downloaded again.
+
+    Args:
+        path (Path): Directory holding the images.
+        max_size (int): Longest side, in pixels, of the stored thumbnails.
+        quality (int): JPEG quality used when recompressing.
+    """
+
+    def __init__(self, path=IMAGES_PATH, max_size=200, quality=80):
+        self.path = Path(path)
+        self.index_path = self.path.joinpath('index.json')
+        self.max_size = max_size
+        self.quality = quality
+        self.downloads = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def image_path(self, digest):
+        return self.path.joinpath(f'{digest}-{self.max_size}.jpg')
+
+    def get(self, url):
+        ### Path to the thumbnail for url, downloading and shrinking it only if it is not on disk yet ###
+        target = self.cached(url)
+        if target is not None:
+            return target
+        return self.add(url, network.get(url))
+
+    def cached(self, url):
+        ### Path to the thumbnail for url if it is already on disk ###
+        key = PLACEHOLDER if is_placeholder(url) else url
+        with self._lock:
+            digest = self.index.get(key)
+        if digest:
+            target = self.image_path(digest)
+            if target.exists():
+                with self._lock:
+                    self.shared += 1
+                return target
+        return None
+
+    def add(self, url, imgdata):
+        ### Shrink and store a downloaded image, unless the same picture is stored already ###
+        if imgdata.status_code != 200:
+            raise ValueError(f'Image download failed with status {imgdata.status_code}: {url}')
+        data = imgdata.content
+        digest = hashlib.sha1(data).hexdigest()
+        target = self.image_path(digest)
+        if target.exists():
+            with self._lock:
+                self.shared += 1
+        else:
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(shrink(data, self.max_size, self.quality))
+            os.replace(tmp, target)
+        with self._lock:
+            self.downloads += 1
+            self.index[PLACEHOLDER if is_placeholder(url) else url] = digest
+        return target
+
+    def save(self):
+        with self._lock:
+            tmp = self.index_path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp, self.index_path)
+
+
+store = None
+_store_lock = threading.Lock()
+
+def open_store():
+    global store
+    with _store_lock:
+        store = ImageStore(max_size=prefs['image_max_size'], quality=prefs['image_quality'])
+    return store
+
+def close_store():
+    global store
+    with _store_lock:
+        if store is not None:
+            store.save()
+        store = None
+
+def get_image(url):
+    images = store
+    if images is None:
+        images = open_store()
+    return images.get(url)
+
+def import_note(db, author_id, html):
+    """
+    Import a note whose images point at files in the image store.
+
+    The html is written next to the images and imported from there, so calibre picks
+    the relative ``<img src>`` files up as note resources. Calibre keeps resources by
+    content hash, so every portrait is stored in the library once, however many
+    notes use it.
+    """
+    IMAGES_PATH.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=IMAGES_PATH, suffix='.html')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        db.import_note('authors', author_id, path)
+    finally:
+        os.remove(path)
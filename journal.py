@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+JOURNALS_PATH = Path(config_dir).joinpath('plugins')
+
+# The last state recorded for an author. Authors that reached a committed state are
+# not processed again when an interrupted job is resumed.
+STATES = ('linked', 'fetched', 'rendered', 'imported', 'skipped', 'failed')
+COMMITTED = ('imported', 'skipped')
+
+def journal_path(library_id):
+    ### Each library has its own journal, so starting a run in one keeps the unfinished run of another ###
+    return JOURNALS_PATH.joinpath(f'gr_author_notes-journal-{library_id}.jsonl')
+
+
+class JobJournal:
+    """
+    Append-only record of a bulk run, kept until the run completes.
+
+    The first line names the library, the options of the run and every author id
+    in it. Each following line is ``{"id": author_id, "state": state}``, appended as
+    the author moves through :data:`STATES`. A run that is cancelled or killed
+    (calibre crashing included) leaves the file behind, and the next run can pick it
+    up with :meth:`load` and go on with :meth:`remaining`.
+
+    A line cut short by a crash, and anything after it, is dropped when the journal
+    is read back.
+    """
+
+    def __init__(self, path, library_id, author_ids, clear=False, force=False, states=None):
+        self.path = Path(path)
+        self.library_id = library_id
+        self.author_ids = list(author_ids)
+        self.clear = clear
+        self.force = force
+        self.states = states or {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def create(cls, library_id, author_ids, clear=False, force=False, path=None):
+        ### Start the journal of a new run, replacing any unfinished one of the library ###
+        journal = cls(path or journal_path(library_id), library_id, author_ids, clear, force)
+        journal.path.parent.mkdir(parents=True, exist_ok=True)
+        journal._file = open(journal.path, 'w', encoding='utf-8')
+        journal._write({'library': library_id, 'clear': clear, 'force': force, 'authors': journal.author_ids})
+        journal.sync()
+        return journal
+
+    @classmethod
+    def load(cls, library_id, path=None):
+        ### The unfinished run for this library, or None ###
+        path = path or journal_path(library_id)
+        try:
+            with open(path, encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                states = {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    states[entry['id']] = entry['state']
+        except (OSError, ValueError, KeyError):
+            return None
+        if header.get('library') != library_id:
+            return None
+        journal = cls(path, library_id, header['authors'], header.get('clear', False), header.get('force', False), states)
+        # write it out again so the run carries on after a clean line, not a torn one
+        journal._file = open(journal.path, 'w', encoding='utf-8')
+        journal._write(header)
+        for author_id, state in states.items():
+            journal._write({'id': author_id, 'state': state})
+        journal.sync()
+        return journal
+
+    def remaining(self):
+        ### Author ids of the run that have not been committed yet ###
+        return [aid for aid in self.author_ids if self.states.get(aid) not in COMMITTED]
+
+    def record(self, author_id, state):
+        with self._lock:
+            self.states[author_id] = state
+            self._write({'id': author_id, 'state': state})
+
+    def _write(self, entry):
+        if self._file is not None:
+            self._file.write(json.dumps(entry) + '\n')
+
+    def sync(self):
+        ### Make everything recorded so far survive a crash ###
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def finish(self):
+        ### The run completed, so there is nothing left to resume ###
+        self.close()
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def discard(library_id):
+        try:
+            os.remove(journal_path(library_id))
+        except OSError:
+            pass
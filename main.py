@@ -2,12 +2,12 @@
 
 import contextlib
 
+import json
+
 from qt.core import Qt, QProgressDialog, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QRadioButton, QMessageBox, QWidget, QTimer, QGroupBox, QCheckBox # type: ignore
 
 from calibre_plugins.grauthornotes.config import prefs # type: ignore
-from calibre_plugins.grauthornotes.unzip import install_libs # type: ignore
-install_libs()
-from calibre_plugins.grauthornotes.authornotes import link, notes, clear # type: ignore
+from calibre_plugins.grauthornotes.journal import JobJournal # type: ignore
 from calibre.library import db # type: ignore
 
 with contextlib.suppress(NameError):
@@ -15,7 +15,7 @@ with contextlib.suppress(NameError):
 
 class AuthorProgressDialog(QProgressDialog):
 
-    def __init__(self, gui, authors, db, authorstotal, skippedtotal, linkstotal, clear, status_msg_type=_('authors'), action_type=_('Getting bio for')):
+    def __init__(self, gui, authors, db, authorstotal, skippedtotal, linkstotal, clear, force=False, journal=None, status_msg_type=_('authors'), action_type=_('Getting bio for')):
         """
         Initialize the progress dialog for processing authors.
         Args:
@@ -26,6 +26,8 @@ class AuthorProgressDialog(QProgressDialog):
             skippedtotal (int): Total number of skipped authors.
             linkstotal (int): Total number of links.
             clear (bool): Flag to indicate if notes should be cleared.
+            force (bool): Flag to regenerate notes even when the author's page is unchanged.
+            journal (JobJournal, optional): The journal the progress of the run is recorded in.
             status_msg_type (str, optional): The type of status message. Defaults to _('authors').
             action_type (str, optional): The type of action being performed. Defaults to _('Getting bio for').
         """
@@ -44,62 +46,65 @@ class AuthorProgressDialog(QProgressDialog):
         
         self.authors, self.db, self.authorstotal, self.skippedtotal = authors, db, authorstotal, skippedtotal
         self.linkstotal, self.clear, self.action_type, self.status_msg_type = linkstotal, clear, action_type, status_msg_type
+        self.unchangedtotal = 0
+        self.journal = journal
         if self.clear:
             self.action_type = _('Clearing notes from')
         self.gui = gui
         self.setWindowTitle('%s %d %s...' % (
             self.action_type, self.total_count, self.status_msg_type))
-        # ... ...
-        self.i, self.t, = 0, 0
-        # ... ...
+        # the engine pulls in the bundled network libraries, so they are only loaded once a run starts
+        from calibre_plugins.grauthornotes.engine import create_engine # type: ignore
+        from calibre_plugins.grauthornotes.writer import NoteWriter # type: ignore
+        self.engine = create_engine(db, (self.bgcolor, self.bordercolor, self.textcolor), clear, force=force, journal=journal)
+        self.writer = NoteWriter(db, gui, clear, prefs['write_chunk'])
+        self.timer = QTimer(self)
+        self.timer.setInterval(100)
+        self.timer.timeout.connect(self.do_author_action)
         QTimer.singleShot(0, self.do_timer_start)
         self.exec_()
 
     def do_timer_start(self):
-        self.author = self.authors[self.i]
-        self.setWindowTitle(f'{self.action_type} {self.total_count} {self.status_msg_type} ...')
-        self.setLabelText(f'{self.action_type}: {self.author[1].get("name")}')
-        self.setValue(self.i)
-        QTimer.singleShot(0, self.do_author_action)
+        self.setValue(0)
+        self.engine.start(self.authors)
+        self.timer.start()
 
     def do_author_action(self):
         #window management
         if self.wasCanceled():
+            self.engine.cancel()
+            self.apply_results(self.engine.drain(), final=True)
             return self.do_close()
-        if self.i >= self.total_count:
+        # queue the writes for every author the workers have finished
+        self.apply_results(self.engine.drain(), final=self.engine.finished)
+        self.setValue(self.engine.completed)
+        if self.engine.finished:
             return self.do_close()
-        self.author = self.authors[self.i]
-        self.i += 1
-        if self.author[1].get('name') == 'Unknown':
-            QTimer.singleShot(0, self.do_author_action)
-            return
-        # code for processing a single author ...
-        author_link = self.author[1].get('link')
-        if author_link == '' and prefs['update_links'] == True and not self.clear:
-            textLabel = _('Getting author link and  ') + self.action_type.lower() + ': ' + self.author[1].get("name")
-            self.setLabelText(textLabel)
-            author_link = link(self.author, self.db)
-            if author_link:
-                self.linkstotal += 1
-        else:
-            self.setLabelText(f'{self.action_type}: {self.author[1].get("name")}')
-        self.setWindowTitle(f'{self.action_type} {self.total_count} {self.status_msg_type} ...')
-        self.setValue(self.i - 1)
-        if self.clear:
-            status = clear(self.author, self.db)
-        else:
-            status = notes(self.author, self.db, self.bgcolor, self.bordercolor, self.textcolor, author_link)
-        if status:
-            self.authorstotal += 1
-        else:
-            self.skippedtotal += 1
 
-        #next author
-        QTimer.singleShot(0, self.do_author_action)
+    def apply_results(self, results, final=False):
+        ### Database writes happen here, on the GUI thread, a chunk at a time ###
+        links, events = self.writer.apply(results, self.engine, final)
+        self.linkstotal += links
+        for result, state in events:
+            if state == 'imported':
+                self.authorstotal += 1
+            elif state == 'unchanged':
+                self.unchangedtotal += 1
+            elif state == 'failed':
+                self.skippedtotal += 1
+        if results:
+            self.setLabelText(f'{self.action_type}: {results[-1].name}')
 
     def do_close(self):
+        self.timer.stop()
+        self.engine.shutdown()
+        if self.journal is not None:
+            # keep the journal of an interrupted run so it can be resumed
+            if self.engine.finished and not self.wasCanceled():
+                self.journal.finish()
+            else:
+                self.journal.close()
         self.hide()
-        self.gui.do_field_item_value_changed()
         self.gui = None
 
 class Dialog(QDialog):
@@ -148,6 +153,11 @@ class Dialog(QDialog):
 
         self.overwrite_cb = QCheckBox(_('Update existing notes'))
         self.mainLayout.addWidget(self.overwrite_cb)
+
+        self.force_cb = QCheckBox(_('Regenerate notes even if Goodreads has not changed'))
+        self.force_cb.setEnabled(False)
+        self.overwrite_cb.toggled.connect(self.force_cb.setEnabled)
+        self.mainLayout.addWidget(self.force_cb)
         
         self.update_notes_button = QPushButton(_('Process Authors'))
         self.update_notes_button.clicked.connect(self.update_notes)
@@ -191,18 +201,21 @@ class Dialog(QDialog):
 
     def update_notes(self):
         
-        from calibre.gui2 import error_dialog, info_dialog # type: ignore
+        from calibre.gui2 import error_dialog, info_dialog, question_dialog # type: ignore
 
-        authorids = []
         authors = []
-        authorstotal = 0
-        skippedtotal = 0
-        linkstotal = 0
         clear = self.clearnotes_rb.isChecked()
-        event = _('Cleared') if clear else _('Added')
-        prep = _('from') if clear else _('to')
         overwrite = self.overwrite_cb.isChecked()
+        force = overwrite and self.force_cb.isChecked()
         db = self.gui.current_db.new_api
+        journal = JobJournal.load(db.library_id)
+        if journal is not None:
+            existing = db.all_field_ids('authors')
+            remaining = [aid for aid in journal.remaining() if aid in existing]
+            if remaining and question_dialog(self, _('Resume unfinished job'), _(f'The last run was interrupted with ') + str(len(remaining)) + _(f' of its ') + str(len(journal.author_ids)) + _(f' author(s) still to do.\n\nResume it instead of starting a new run?')):
+                authors = list(db.author_data(author_ids=remaining).items())
+                return self.process_authors(db, authors, journal.clear, journal.force, journal, info_dialog)
+            journal.close()
         if self.srcAuthors_rb.isChecked():
             authors = list(db.author_data().items())
         elif self.srcBooks_rb.isChecked():
@@ -214,20 +227,8 @@ class Dialog(QDialog):
                                 _('No books selected'), show=True)
             # Map the rows to book ids
             ids = list(map(self.gui.library_view.model().id, rows))
-            for bid in ids:
-                mi = db.get_metadata(bid)
-                for author in mi.authors:
-                    print(f'Author: {author}')
-                    aid = db.get_item_id('authors', author)
-                    note = db.export_note('authors', aid)
-                    print(f'Note: {note}')
-                    if clear and note:
-                        authorids.append(aid)
-                        continue
-                    elif ('Generated using the GR Author Notes plugin') in note and not overwrite:
-                        continue
-                    else:
-                        authorids.append(aid)
+            from calibre_plugins.grauthornotes.authornotes import select_authors # type: ignore
+            authorids = select_authors(db, ids, clear, overwrite)
             authors = list(db.author_data(author_ids=authorids).items())
         else:
             info_dialog(self, _('Error'), _('No authors selected. Make sure you have chosen the correct Author Selection and/or that you have books selected.'), show=True)
@@ -237,10 +238,20 @@ class Dialog(QDialog):
             info_dialog(self, _('Info'), _('All selected authors already have their note set by GR Author Notes.'), show=True)
             return
 
-        dlg = AuthorProgressDialog(self.gui, authors, db, authorstotal, skippedtotal, linkstotal, clear)
+        journal = JobJournal.create(db.library_id, [author[0] for author in authors], clear, force)
+        self.process_authors(db, authors, clear, force, journal, info_dialog)
+
+    def process_authors(self, db, authors, clear, force, journal, info_dialog):
+        ### Run the progress dialog over the authors and report what it did ###
+        authorstotal = 0
+        skippedtotal = 0
+        linkstotal = 0
+        event = _('Cleared') if clear else _('Added')
+        prep = _('from') if clear else _('to')
+        dlg = AuthorProgressDialog(self.gui, authors, db, authorstotal, skippedtotal, linkstotal, clear, force, journal)
         if dlg.wasCanceled():
         # do whatever should be done if user cancelled
-            canceledtext = _(f'Process was canceled after updating ') + dlg.authorstotal + _(f' author(s) \n\n') + event + _(f' a total of ') + dlg.authorstotal + _(f' author bios ') + prep + _(f' notes.\n\n')
+            canceledtext = _(f'Process was canceled after updating ') + str(dlg.authorstotal) + _(f' author(s) \n\n') + event + _(f' a total of ') + str(dlg.authorstotal) + _(f' author bios ') + prep + _(f' notes.\n\n')
             self.build_dialog(dlg, canceledtext, info_dialog, _('Canceled'))
         else:
             processedtext = _(f'Processed ') + str(len(authors)) + _(f' author(s) \n\n') + event + _(f' a total of ') + str(dlg.authorstotal) + _(f' author bios ') +  prep + _(f' notes. \n\n')
@@ -250,7 +261,12 @@ class Dialog(QDialog):
     def build_dialog(self, dlg, text, info_dialog, title):
         text = self.get_linked(dlg, text)
         text = self.get_skipped(dlg, text)
-        info_dialog(self, title, text, show=True)
+        text = self.get_unchanged(dlg, text)
+        text = self.get_cached(dlg, text)
+        text = self.get_timing(dlg, text)
+        stats = dlg.engine.stats
+        det_msg = json.dumps(stats.summary(), indent=2) if stats is not None else ''
+        info_dialog(self, title, text, det_msg=det_msg, show=True)
 
     def get_skipped(self, dlg, text):
         if dlg.skippedtotal > 0:
@@ -260,6 +276,35 @@ class Dialog(QDialog):
         else:
             return text
     
+    def get_unchanged(self, dlg, text):
+        if dlg.unchangedtotal > 0:
+            text = f'{text}\n\n'
+            textEnd = text + _(f'A total of ') + str(dlg.unchangedtotal) + _(f' author(s) were left as they were because their Goodreads page has not changed.')
+            return (textEnd)
+        else:
+            return text
+
+    def get_cached(self, dlg, text):
+        cache = dlg.engine.cache
+        if cache is not None and (cache.hits or cache.misses or cache.revalidated):
+            text = f'{text}\n\n'
+            textEnd = text + _(f'Pages from cache: ') + str(cache.hits) + _(f', revalidated: ') + str(cache.revalidated) + _(f', downloaded: ') + str(cache.misses) + '.'
+            return (textEnd)
+        else:
+            return text
+
+    def get_timing(self, dlg, text):
+        stats = dlg.engine.stats
+        if stats is None or not stats.summary()['stages']:
+            return text
+        text = f'{text}\n\n' + stats.report()
+        if prefs['save_reports']:
+            try:
+                text = text + '\n\n' + _('Report saved to ') + str(stats.export())
+            except OSError as e:
+                print(f'Report error: {e}')
+        return text
+
     def get_linked(self, dlg, text):
         if dlg.linkstotal > 0:
             textEnd = text + _(f'Added links to a total of ') + str(dlg.linkstotal) + _(f' authors.')
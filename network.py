@@ -0,0 +1,500 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+from calibre_plugins.grauthornotes import timing # type: ignore
+from calibre_plugins.grauthornotes.unzip import install_libs # type: ignore
+
+install_libs()
+import httpx
+
+# Requests in flight at once to a host of the asyncio pipeline once it is known to speak HTTP/2
+HTTP2_STREAMS = 16
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+class HostLimiter:
+    """
+    Cap the number of requests that may be in flight to any one host.
+
+    Worker threads take a slot for the host of the URL they are about to fetch,
+    so raising the number of workers does not hammer Goodreads (or its image CDN)
+    with more simultaneous connections than the configured limit.
+    """
+
+    def __init__(self, limit):
+        self.limit = max(1, int(limit))
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def reset(self, limit):
+        with self._lock:
+            self.limit = max(1, int(limit))
+            self._hosts = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            sem = self._hosts.get(host)
+            if sem is None:
+                sem = self._hosts[host] = threading.BoundedSemaphore(self.limit)
+        with sem:
+            yield
+
+limiter = HostLimiter(prefs['per_host_limit'])
+
+class RateLimiter:
+    """
+    Token bucket per host that slows down when the host starts throttling us.
+
+    Every request takes a token from the bucket of its host, and tokens come back
+    at ``rate`` per second, so bursts are allowed up to ``burst`` requests but the
+    average request rate never goes over ``rate``. A 429/503 from a host halves its
+    rate. Every success gives back a tenth of the configured rate until it is back
+    where it started.
+
+    Args:
+        rate (float): Requests per second allowed to each host.
+        burst (int): Requests that may be sent back to back after a quiet spell.
+    """
+
+    MIN_RATE = 0.1
+
+    def __init__(self, rate, burst=None):
+        self._lock = threading.Lock()
+        self.reset(rate, burst)
+
+    def reset(self, rate, burst=None):
+        with self._lock:
+            self.rate = max(self.MIN_RATE, float(rate))
+            self.burst = max(1, int(burst or self.rate))
+            self._hosts = {}
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        bucket = self._hosts.get(host)
+        if bucket is None:
+            # [tokens, time they were counted, current rate]
+            bucket = self._hosts[host] = [float(self.burst), time.monotonic(), self.rate]
+        return bucket
+
+    def reserve(self, url):
+        ### Take a token for the host of url if it has one, else return the seconds until it will ###
+        with self._lock:
+            bucket = self._bucket(url)
+            now = time.monotonic()
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * bucket[2])
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / bucket[2]
+
+    def acquire(self, url):
+        ### Wait until the host of url has a token to spare and take it ###
+        while True:
+            wait = self.reserve(url)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        ### acquire() for the event loop, waiting without blocking it ###
+        while True:
+            wait = self.reserve(url)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def throttled(self, url):
+        with self._lock:
+            bucket = self._bucket(url)
+            bucket[2] = max(self.MIN_RATE, bucket[2] / 2)
+
+    def succeeded(self, url):
+        with self._lock:
+            bucket = self._bucket(url)
+            if bucket[2] < self.rate:
+                bucket[2] = min(self.rate, bucket[2] + self.rate / 10)
+
+rates = RateLimiter(prefs['request_rate'])
+
+class RetryPolicy:
+    """
+    How often, and how far apart, a failed request is tried again.
+
+    The wait before retry ``n`` is drawn between zero and ``base * 2**n`` seconds
+    (exponential backoff with full jitter, capped at ``cap``) so workers that failed
+    together do not all come back together. A ``Retry-After`` sent by the server
+    replaces the drawn wait.
+    """
+
+    def __init__(self, attempts, base, cap):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.cap, retry_after)
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+# Retries per kind of failure, on top of the first try
+POLICIES = {
+    'throttled': RetryPolicy(5, 2.0, 120.0),    # 429, 503: the host asked us to slow down
+    'server': RetryPolicy(3, 1.0, 30.0),        # other 5xx
+    'network': RetryPolicy(3, 0.5, 10.0),       # timeouts, dropped connections
+}
+THROTTLED_STATUS = (429, 503)
+SERVER_STATUS = (500, 502, 504)
+NETWORK_ERRORS = (httpx.NetworkError, httpx.ProtocolError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.WriteTimeout, httpx.PoolTimeout)
+
+def retry_after(headers):
+    ### Seconds to wait from a Retry-After header, which is either a number or an http date ###
+    value = headers.get('retry-after') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def retry(call, url, errors=NETWORK_ERRORS):
+    """
+    Run one request step, retrying it by the policy for the way it failed.
+
+    ``call`` is made after taking a token for the host of ``url``. It either returns
+    a response, which is retried on a throttling or server status, or raises, and
+    the exceptions in ``errors`` are retried as network failures. Once a policy is
+    out of retries the last response is returned or the last exception raised.
+    """
+    attempts = dict.fromkeys(POLICIES, 0)
+    while True:
+        rates.acquire(url)
+        try:
+            response = call()
+        except errors:
+            delay = retry_delay(url, attempts)
+            if delay is None:
+                raise
+        else:
+            delay = retry_delay(url, attempts, response)
+            if delay is None:
+                return response
+        time.sleep(delay)
+
+async def retry_async(call, url, errors=NETWORK_ERRORS):
+    ### retry() for a coroutine function, on the event loop ###
+    attempts = dict.fromkeys(POLICIES, 0)
+    while True:
+        await rates.acquire_async(url)
+        try:
+            response = await call()
+        except errors:
+            delay = retry_delay(url, attempts)
+            if delay is None:
+                raise
+        else:
+            delay = retry_delay(url, attempts, response)
+            if delay is None:
+                return response
+        await asyncio.sleep(delay)
+
+def retry_delay(url, attempts, response=None):
+    ### Seconds to wait before the next try, or None once the response (or, without one, the error) is final ###
+    wait = None
+    if response is None:
+        kind = 'network'
+    else:
+        status = getattr(response, 'status_code', 200)
+        if status in THROTTLED_STATUS:
+            kind = 'throttled'
+            rates.throttled(url)
+            wait = retry_after(response.headers)
+        elif status in SERVER_STATUS:
+            kind = 'server'
+        else:
+            rates.succeeded(url)
+            return None
+    if attempts[kind] >= POLICIES[kind].attempts:
+        return None
+    delay = POLICIES[kind].delay(attempts[kind], wait)
+    attempts[kind] += 1
+    timing.count(f'retries_{kind}')
+    print(f'Retrying {url} in {delay:.1f}s ({kind})')
+    return delay
+
+class Session:
+    """
+    One pooled keep-alive HTTP client shared by every worker during a run.
+
+    Built on the vendored ``httpx.Client`` so connections (and their TLS
+    handshakes) to goodreads.com and its image CDN are reused between pages
+    instead of being set up again for every request.
+
+    Args:
+        http2 (bool): Negotiate HTTP/2 where the server supports it.
+        max_connections (int): Size of the connection pool.
+        timeout (float): Seconds to wait on connect/read before giving up.
+    """
+
+    def __init__(self, http2=True, max_connections=8, timeout=30.0):
+        self.client = httpx.Client(
+            http2=http2,
+            headers={"User-Agent": USER_AGENT},
+            pool_limits=httpx.PoolLimits(max_keepalive=max_connections, max_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+        )
+        # the vendored httpcore stalls requests that wait for a pooled connection, so none are let wait there
+        self.connections = threading.BoundedSemaphore(max(1, int(max_connections)))
+
+    def get(self, url, headers=None, until=None):
+        with self.connections:
+            if until is None:
+                return self.client.get(url, headers=headers)
+            # Read the body a chunk at a time and hang up as soon as we have what we need
+            content = bytearray()
+            with self.client.stream('GET', url, headers=headers) as r:
+                for chunk in r.iter_bytes():
+                    start = len(content)
+                    content += chunk
+                    if until(content, start):
+                        break
+                return Response(str(r.url), bytes(content), r.status_code, r.headers)
+
+    def close(self):
+        self.client.close()
+
+class AsyncSession:
+    """
+    The :class:`Session` of the asyncio pipeline, on the vendored ``httpx.AsyncClient``.
+
+    Only used from the event loop it was created on. Until a host is known to
+    speak HTTP/2, requests to it are capped at ``per_host`` like
+    :class:`HostLimiter` does for the threaded workers, and the total at the pool
+    size like :class:`Session` does, since each of them may need a connection of
+    its own. Once a response from the host comes back over HTTP/2, all of its
+    requests are streams of the one connection it keeps in the pool: up to
+    ``streams`` of them are let through at once, and how often they start is
+    left to :data:`rates`.
+    """
+
+    def __init__(self, http2=True, max_connections=8, per_host=2, timeout=30.0, streams=HTTP2_STREAMS):
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers={"User-Agent": USER_AGENT},
+            pool_limits=httpx.PoolLimits(max_keepalive=max_connections, max_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+        )
+        self.per_host = max(1, int(per_host))
+        self.streams = max(self.per_host, int(streams))
+        self.connections = asyncio.Semaphore(max(1, int(max_connections)))
+        self._hosts = {}
+        self._http2 = set()
+
+    def slot(self, host):
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def get(self, url, headers=None, until=None):
+        host = urlsplit(url).netloc.lower()
+        async with self.slot(host):
+            if host in self._http2:
+                response, version = await self.request(url, headers, until)
+            else:
+                await self.connections.acquire()
+                keep = False
+                try:
+                    response, version = await self.request(url, headers, until)
+                    keep = version == 'HTTP/2' and host not in self._http2
+                    if keep:
+                        self.multiplexed(host)
+                finally:
+                    # the first HTTP/2 response keeps its slot for the connection the host now holds
+                    if not keep:
+                        self.connections.release()
+        timing.count('requests')
+        timing.count('bytes_downloaded', len(response.content))
+        return response
+
+    def multiplexed(self, host):
+        ### Let up to streams requests to an HTTP/2 host through at once ###
+        self._http2.add(host)
+        sem = self.slot(host)
+        for _ in range(self.streams - self.per_host):
+            sem.release()
+
+    async def request(self, url, headers=None, until=None):
+        ### The response and the http version it came over ###
+        if until is None:
+            response = await self.client.get(url, headers=headers)
+            return response, response.http_version
+        content = bytearray()
+        async with self.client.stream('GET', url, headers=headers) as r:
+            async for chunk in r.aiter_bytes():
+                start = len(content)
+                content += chunk
+                if until(content, start):
+                    break
+            return Response(str(r.url), bytes(content), r.status_code, r.headers), r.http_version
+
+    async def close(self):
+        await self.client.aclose()
+
+
+session = None
+_session_lock = threading.Lock()
+
+def open_session():
+    ### Start the shared client for a run, replacing any previous one ###
+    global session
+    with _session_lock:
+        if session is not None:
+            session.close()
+        session = Session(http2=prefs['http2'], max_connections=prefs['pool_size'])
+    return session
+
+def close_session():
+    global session
+    with _session_lock:
+        if session is not None:
+            session.close()
+        session = None
+
+def get(url, headers=None, until=None):
+    """
+    GET a url on the shared session, waiting for a free slot on its host first.
+
+    When ``until`` is given the body is streamed and the download stops as soon as
+    ``until(body_so_far, start)`` returns True, so only the start of the page is read.
+    ``start`` is where the bytes that came in since the last call begin, so the
+    check only has to look at those.
+
+    Requests are paced by :data:`rates` and retried through :func:`retry`.
+    """
+    client = session
+    if client is None:
+        client = open_session()
+    def call():
+        with limiter.slot(url):
+            response = client.get(url, headers=headers, until=until)
+        timing.count('requests')
+        timing.count('bytes_downloaded', len(response.content))
+        return response
+    return retry(call, url)
+
+class Response:
+    """
+    The parts of a response the scrapers use, for bodies read from the response
+    cache or cut short by :func:`get`.
+    """
+
+    def __init__(self, url, content, status_code=200, headers=None):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+cache = None
+
+def open_cache(use_cache=None, ttl_days=None):
+    ### Open the response cache for a run, or drop it if caching is turned off. Arguments left at None come from prefs ###
+    global cache
+    if use_cache is None:
+        use_cache = prefs['use_cache']
+    if ttl_days is None:
+        ttl_days = prefs['cache_ttl_days']
+    if use_cache:
+        from calibre_plugins.grauthornotes.cache import ResponseCache # type: ignore
+        cache = ResponseCache(ttl=ttl_days * 86400, max_size=prefs['cache_size_mb'] * 1024 * 1024)
+    else:
+        cache = None
+    return cache
+
+def close_cache():
+    global cache
+    if cache is not None:
+        cache.save()
+    cache = None
+
+def fetch(url, until=None):
+    """
+    GET a Goodreads page through the response cache.
+
+    Fresh entries are served from disk. Stale entries are revalidated with their
+    ETag/Last-Modified validators and only downloaded again when the server says
+    they changed.
+
+    With ``until`` only the start of the page is downloaded (see :func:`get`). That
+    prefix is cached under its own key so it is never mistaken for the full page.
+    """
+    key, store, entry, cached = cache_lookup(url, until)
+    if cached is not None:
+        return cached
+    headers = store.validators(entry) if entry is not None else None
+    webdata = get(url, headers=headers, until=until)
+    cached = cache_update(url, key, store, entry, webdata)
+    if cached is None:
+        # the cached copy went missing after the server said it was still good
+        webdata = get(url, until=until)
+        cached = cache_update(url, key, store, None, webdata)
+    return cached
+
+async def fetch_async(session, url, until=None):
+    ### fetch() on an AsyncSession, for the asyncio pipeline ###
+    key, store, entry, cached = cache_lookup(url, until)
+    if cached is not None:
+        return cached
+    headers = store.validators(entry) if entry is not None else None
+    webdata = await retry_async(lambda: session.get(url, headers=headers, until=until), url)
+    cached = cache_update(url, key, store, entry, webdata)
+    if cached is None:
+        webdata = await retry_async(lambda: session.get(url, until=until), url)
+        cached = cache_update(url, key, store, None, webdata)
+    return cached
+
+def cache_lookup(url, until):
+    ### (key, cache, entry, response): the response is set when a fresh entry answers the request ###
+    key = url if until is None else f'{url}#partial'
+    store = cache
+    entry = store.lookup(key) if store is not None else None
+    if entry is not None and store.is_fresh(entry):
+        with contextlib.suppress(OSError):
+            content = store.read(entry)
+            store.record('hits')
+            return key, store, entry, Response(url, content)
+        entry = None
+    return key, store, entry, None
+
+def cache_update(url, key, store, entry, webdata):
+    ### Bring the cache up to date with a response and return what the caller gets, None if the cached copy is gone ###
+    if store is None:
+        return webdata
+    if webdata.status_code == 304 and entry is not None:
+        try:
+            content = store.read(entry)
+        except OSError:
+            return None
+        store.refresh(key)
+        store.record('revalidated')
+        return Response(url, content)
+    store.record('misses')
+    if webdata.status_code == 200:
+        store.store(key, webdata.content, webdata.headers)
+    return webdata
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+REPORTS_PATH = Path(config_dir).joinpath('plugins/gr_author_notes-reports')
+
+# In pipeline order. Worker stages overlap each other across threads, import runs on the GUI thread.
+STAGES = ('db_read', 'link', 'fetch', 'parse', 'image', 'translate', 'render', 'import')
+STAGE_NAMES = {
+    'db_read': 'Database reads', 'link': 'Link resolution', 'fetch': 'Author page download',
+    'parse': 'Author page parsing', 'image': 'Author image', 'translate': 'Translation',
+    'render': 'Note rendering', 'import': 'Note import',
+}
+# Histogram bucket upper bounds in ms: 1, 2, 4 ... 32768, then everything slower
+BUCKETS = tuple(2 ** n for n in range(16))
+
+class StageTimes:
+    ### Count, total, slowest and a power-of-two histogram of one stage's durations ###
+
+    __slots__ = ('count', 'total', 'max', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        ms = seconds * 1000
+        for i, bound in enumerate(BUCKETS):
+            if ms < bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, pct):
+        ### Upper bound in ms of the bucket the percentile falls in, at most the slowest run ###
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target:
+                return round(min(BUCKETS[i], self.max * 1000) if i < len(BUCKETS) else self.max * 1000, 2)
+        return round(self.max * 1000, 2)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 3),
+            'mean_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'max_ms': round(self.max * 1000, 2),
+            'histogram_ms': {f'<{b}' if i < len(BUCKETS) else f'>={BUCKETS[-1]}': n
+                             for i, (b, n) in enumerate(zip(BUCKETS + (None,), self.histogram)) if n},
+        }
+
+
+class RunStats:
+    """
+    Where the time of a run went, stage by stage.
+
+    Stages are timed with :func:`time.perf_counter` around the code that does the
+    work and added up here, along with plain counters (requests, retries, bytes
+    downloaded...). Taking a measurement is a lock and a few additions, cheap
+    next to any of the stages timed.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.clock = time.perf_counter()
+        self.elapsed = None
+        self.stages = {name: StageTimes() for name in STAGES}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            times = self.stages.get(stage)
+            if times is None:
+                times = self.stages[stage] = StageTimes()
+            times.add(seconds)
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def finish(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.clock
+
+    def summary(self):
+        with self._lock:
+            elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.clock
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'wall_s': round(elapsed, 3),
+                'stages': {name: times.summary() for name, times in self.stages.items() if times.count},
+                'counters': dict(self.counters),
+            }
+
+    def report(self):
+        ### A few lines for the summary dialog, slowest stages first ###
+        summary = self.summary()
+        stages = sorted(summary['stages'].items(), key=lambda s: s[1]['total_s'], reverse=True)
+        lines = [f"Time spent (all workers added up, the run took {summary['wall_s']:.1f}s):"]
+        for name, s in stages:
+            lines.append(f"{STAGE_NAMES.get(name, name)}: {s['total_s']:.1f}s, {s['count']} x {s['mean_ms']:.0f} ms"
+                         f" (p95 {s['p95_ms']:.0f} ms)")
+        return '\n'.join(lines)
+
+    def export(self, path=None):
+        ### Write the summary as JSON, by default to a new file in REPORTS_PATH ###
+        if path is None:
+            REPORTS_PATH.mkdir(parents=True, exist_ok=True)
+            path = REPORTS_PATH.joinpath(time.strftime('run-%Y%m%d-%H%M%S.json', time.localtime(self.started)))
+        path = Path(path)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+        os.replace(tmp, path)
+        return path
+
+
+stats = None
+
+def open_stats():
+    global stats
+    stats = RunStats()
+    return stats
+
+def close_stats():
+    global stats
+    if stats is not None:
+        stats.finish()
+    stats = None
+
+@contextmanager
+def stage(name):
+    ### Time the body as one run of the stage, when a run is being measured ###
+    current = stats
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, time.perf_counter() - start)
+
+def count(counter, n=1):
+    current = stats
+    if current is not None:
+        current.count(counter, n)
@@ -1,9 +1,440 @@
-from googletrans import Translator
+import abc
 import html
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from calibre.utils.config import config_dir # type: ignore
+
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+from calibre_plugins.grauthornotes import network # type: ignore
+
+MEMORY_PATH = Path(config_dir).joinpath('plugins/gr_author_notes-translations.json')
+DICTIONARY_PATH = Path(config_dir).joinpath('plugins/gr_author_notes-dictionary.json')
+# Google takes the text as a GET parameter, so keep each batch well under the URL limit
+MAX_BATCH_CHARS = 1800
+TRANSLATE_URL = 'https://translate.google.com/'
+SEPARATOR = '\n'
+# Line breaks a long text is cut at. They are kept as they are and never sent to Google.
+BREAKS = re.compile(r'(<br\s*/?>|</?(?:p|div)\b[^>]*>|\n)', re.IGNORECASE)
+TAG = re.compile(r'<[^>]*>')
+ELEMENT_TAG = re.compile(r'<(/?)([a-zA-Z][\w:-]*)[^>]*?(/?)>')
+VOID_ELEMENTS = ('area', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr')
+SENTENCE_END = re.compile(r'(?<=[.!?\u2026\u3002\uff01\uff1f])["\'\u201d\u2019)\]]*\s+')
+
+class TranslationMemory:
+    """
+    Translations already made, by target language and source text.
+
+    Field labels such as "Born", "Website" or "Genre" come up for every author. Once
+    one of them has been translated it is answered from here, in this run and in
+    every later one, without asking Google again. Only short texts are kept, since
+    a bio is seldom translated twice and would only make the file grow.
+    """
+
+    MAX_CHARS = 300
+    SAVE_EVERY = 50
+
+    def __init__(self, path=MEMORY_PATH):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._unsaved = 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.languages = json.load(f)
+        except (OSError, ValueError):
+            self.languages = {}
+        # memories saved before there was a limit can still hold whole bios
+        for texts in self.languages.values():
+            for text in [text for text in texts if len(text) > self.MAX_CHARS]:
+                del texts[text]
+                self._unsaved += 1
+
+    def get(self, text, lang):
+        if len(text) > self.MAX_CHARS:
+            return None
+        with self._lock:
+            found = self.languages.get(lang, {}).get(text)
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return found
+
+    def put(self, text, lang, translated):
+        if len(text) > self.MAX_CHARS:
+            return
+        with self._lock:
+            self.languages.setdefault(lang, {})[text] = translated
+            self._unsaved += 1
+            if self._unsaved >= self.SAVE_EVERY:
+                self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._unsaved:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.languages, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._unsaved = 0
+
+
+class Backend(abc.ABC):
+    """
+    Somewhere translations come from.
+
+    Each backend declares how it wants to be called and the rest of this module
+    schedules against that: ``batch_chars`` is the longest text sent in one
+    request, so short strings are joined up to it and longer ones cut into
+    chunks below it (None when strings must be sent one by one, whole), and
+    ``concurrency`` is how many requests may be in flight at once, across every
+    worker of the run.
+    """
+
+    name = ''
+    batch_chars = MAX_BATCH_CHARS
+    concurrency = 4
+    # Whether translations are kept in the translation memory
+    remember = True
+
+    def __init__(self):
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+
+    def request(self, text, lang):
+        ### One translation, waiting for a free slot on the backend first ###
+        with self.slots:
+            return self.translate(text, lang)
+
+    @abc.abstractmethod
+    def translate(self, text, lang):
+        ...
+
+    def memory_key(self, lang):
+        return f'{self.name}:{lang}'
+
+    def close(self):
+        pass
+
+
+class GoogleBackend(Backend):
+    ### translate.google.com through the bundled googletrans ###
+
+    name = 'google'
+
+    def __init__(self):
+        super().__init__()
+        # googletrans (and hstspreload's big table) is only imported by runs that translate
+        from googletrans import Translator
+        self.client = Translator(raise_exception=True, text_only=True)
+
+    def translate(self, text, lang):
+        from googletrans.client import StatusError
+
+        def call():
+            try:
+                return self.client.translate(text, dest=lang)
+            except StatusError as e:
+                # handed to retry() as the response, so its status and Retry-After pick the policy
+                return e
+        translated = network.retry(call, TRANSLATE_URL)
+        if isinstance(translated, StatusError):
+            raise translated
+        return html.unescape(translated.text)
+
+    def memory_key(self, lang):
+        # the translation memory was Google's alone before there were other backends
+        return lang
+
+
+class LibreTranslateBackend(Backend):
+    """
+    A LibreTranslate compatible server, normally one running on this machine.
+
+    Args:
+        url (str): Where the server is, without the ``/translate`` endpoint.
+        api_key (str): The key to send, if the server asks for one.
+        timeout (float): Seconds to wait for a translation, which a local model
+                         on a slow machine can take a while over.
+    """
+
+    name = 'libretranslate'
+    batch_chars = 2000
+    concurrency = 4
+
+    def __init__(self, url, api_key='', timeout=120.0):
+        super().__init__()
+        import httpx
+        self.url = url.rstrip('/') + '/translate'
+        self.api_key = api_key
+        self.client = httpx.Client(timeout=httpx.Timeout(timeout))
+
+    def translate(self, text, lang):
+        payload = {'q': text, 'source': 'auto', 'target': lang, 'format': 'html'}
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        response = network.retry(lambda: self.client.post(self.url, json=payload), self.url)
+        if response.status_code != 200:
+            raise Exception(f'Unexpected status code "{response.status_code}" from {self.url}')
+        return response.json()['translatedText']
+
+    def close(self):
+        self.client.close()
+
+
+class DictionaryBackend(Backend):
+    """
+    Translations looked up in a JSON file, for machines that cannot reach any service.
+
+    The file maps each language code to the source texts and their translations,
+    like ``{"fr": {"Born": "Naissance", "Website": "Site web"}}``, which suits the
+    fixed field labels of the notes. Anything not in it is left as it is.
+    """
+
+    name = 'dictionary'
+    batch_chars = None
+    concurrency = 64
+    remember = False
+
+    def __init__(self, path=DICTIONARY_PATH):
+        super().__init__()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.languages = json.load(f)
+        except (OSError, ValueError):
+            self.languages = {}
+
+    def translate(self, text, lang):
+        found = self.languages.get(lang, {}).get(text.strip())
+        return text if found is None else keep_space(text, found)
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, LibreTranslateBackend, DictionaryBackend)}
+
+backend = None
+memory = None
+chunk_pool = None
+_lock = threading.Lock()
+
+def new_backend():
+    ### The backend the settings ask for ###
+    name = prefs['translator']
+    if name == LibreTranslateBackend.name:
+        return LibreTranslateBackend(prefs['libretranslate_url'], prefs['libretranslate_key'])
+    return BACKENDS.get(name, GoogleBackend)()
+
+def open_translation():
+    ### One backend (and its clients and limits) plus the translation memory for the run ###
+    global backend, memory, chunk_pool
+    with _lock:
+        backend = new_backend()
+        memory = TranslationMemory()
+        chunk_pool = ThreadPoolExecutor(max_workers=backend.concurrency, thread_name_prefix='grauthornotes-translate')
+
+def close_translation():
+    global backend, memory, chunk_pool
+    with _lock:
+        if memory is not None:
+            memory.save()
+        if chunk_pool is not None:
+            chunk_pool.shutdown(wait=False)
+        if backend is not None:
+            backend.close()
+        backend = memory = chunk_pool = None
+
+def _session():
+    global backend, memory
+    with _lock:
+        if backend is None:
+            backend = new_backend()
+        if memory is None:
+            memory = TranslationMemory()
+        return backend, memory
+
+def keep_space(source, target):
+    ### Give target the leading and trailing whitespace of source, which Google drops ###
+    stripped = source.strip()
+    if not stripped:
+        return source
+    start = source.index(stripped[0])
+    return source[:start] + target.strip() + source[start + len(stripped):]
+
+def sentences(text):
+    ### Cut text after each sentence end that is not inside a tag ###
+    tags = [m.span() for m in TAG.finditer(text)]
+    start, t = 0, 0
+    for m in SENTENCE_END.finditer(text):
+        while t < len(tags) and tags[t][1] <= m.start():
+            t += 1
+        if t < len(tags) and tags[t][0] <= m.start():
+            continue
+        yield text[start:m.end()]
+        start = m.end()
+    if start < len(text):
+        yield text[start:]
+
+def opened(stack, text):
+    ### The (name, opening tag) of the elements open once text has been read after those of stack ###
+    stack = list(stack)
+    for m in ELEMENT_TAG.finditer(text):
+        closing, name, self_closing = m.group(1), m.group(2).lower(), m.group(3)
+        if closing:
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    del stack[i:]
+                    break
+        elif not self_closing and name not in VOID_ELEMENTS:
+            stack.append((name, m.group(0)))
+    return stack
+
+def opening_tags(stack):
+    return ''.join(tag for name, tag in stack)
+
+def closing_tags(stack):
+    return ''.join(f'</{name}>' for name, tag in reversed(stack))
+
+def cut_point(sentence, limit):
+    ### Where to cut a sentence longer than limit: the last space before it outside of tags, never inside a tag ###
+    cut = sentence.rfind(' ', 0, limit)
+    tag = sentence.rfind('<', 0, cut)
+    if tag > sentence.rfind('>', 0, cut):
+        cut = tag
+    if cut > 0:
+        return cut
+    tag = sentence.rfind('<', 0, limit)
+    if tag > sentence.rfind('>', 0, limit):
+        return sentence.find('>', limit) + 1 or len(sentence)
+    return limit
+
+def chunks(text, limit=MAX_BATCH_CHARS, stack=None):
+    """
+    Whole sentences of text joined up to limit characters. A longer sentence is
+    cut at a space outside of tags.
+
+    An element still open at the end of a chunk is closed there and opened again
+    at the start of the next, so every chunk is balanced html, and those tags
+    count towards limit. ``stack`` holds the elements open before text, and is
+    left holding the ones open after it.
+    """
+    if stack is None:
+        stack = []
+    head, chunk, after = opening_tags(stack), '', list(stack)
+    for sentence in sentences(text):
+        while sentence:
+            state = opened(after, sentence)
+            if len(head) + len(chunk) + len(sentence) + len(closing_tags(state)) <= limit:
+                chunk, after, sentence = chunk + sentence, state, ''
+            elif chunk:
+                yield head + chunk + closing_tags(after)
+                head, chunk = opening_tags(after), ''
+            else:
+                budget = max(1, limit - len(head) - len(closing_tags(after)))
+                while True:
+                    cut = cut_point(sentence, budget)
+                    state = opened(after, sentence[:cut])
+                    over = len(head) + cut + len(closing_tags(state)) - limit
+                    if over <= 0 or budget == 1:
+                        break
+                    # tags opened in the piece are closed after it too
+                    budget = max(1, budget - over)
+                yield head + sentence[:cut] + closing_tags(state)
+                head, after, sentence = opening_tags(state), state, sentence[cut:]
+    if chunk:
+        yield head + chunk + closing_tags(after)
+    stack[:] = after
+
+def translate_long(backend, string, lang):
+    """
+    Translate a text too long for one request, such as a long bio.
+
+    The html is cut at its line breaks, which are kept as they are, and the text
+    between them at sentence ends outside of tags, into chunks below the
+    backend's batch_chars. An element cut in two is closed at the end of one chunk
+    and opened again at the start of the next, so every chunk sent is balanced,
+    and the length of those tags is kept within batch_chars as well.
+    The chunks are translated side by side and put back in order, so the time
+    taken is that of the slowest chunk, not of the whole text.
+    """
+    pieces = []
+    # the elements open across the line breaks
+    stack = []
+    for i, part in enumerate(BREAKS.split(string)):
+        if i % 2:
+            pieces.append(part)
+        else:
+            pieces.extend(chunks(part, backend.batch_chars, stack))
+
+    def one(piece):
+        if BREAKS.fullmatch(piece) or not TAG.sub('', piece).strip():
+            return piece
+        return keep_space(piece, backend.request(piece.strip(), lang))
+
+    pool = chunk_pool
+    if pool is None or sum(1 for piece in pieces if piece.strip()) < 2:
+        return ''.join(map(one, pieces))
+    return ''.join(pool.map(one, pieces))
+
+def batches(strings, limit=MAX_BATCH_CHARS):
+    ### Group strings into newline-joined requests below limit characters ###
+    batch, size = [], 0
+    for string in strings:
+        if batch and size + len(string) + 1 > limit:
+            yield batch
+            batch, size = [], 0
+        batch.append(string)
+        size += len(string) + 1
+    if batch:
+        yield batch
 
 def translate(string: str, lang):
-    translator = Translator()
-    return html.unescape(translator.translate(string, dest=lang).text)
+    return translate_list([string], lang)[0]
 
 def translate_list(list: list, lang):
-    return [translate(item, lang) for item in list]
\ No newline at end of file
+    """
+    Translate a list of strings, answering what we can from the translation memory
+    and sending the rest to the backend in as few requests as it allows.
+    """
+    backend, tm = _session()
+    key = backend.memory_key(lang)
+    limit = backend.batch_chars
+    strings = [str(item) for item in list]
+    results = {}
+    missing = []
+    for string in dict.fromkeys(strings):
+        if not string.strip():
+            found = string
+        else:
+            found = tm.get(string, key) if backend.remember else None
+        if found is None:
+            missing.append(string)
+        else:
+            results[string] = found
+    if limit is None:
+        single, joinable = missing, []
+    else:
+        single = [s for s in missing if SEPARATOR in s or len(s) >= limit]
+        joinable = [s for s in missing if s not in single]
+    for batch in batches(joinable, limit):
+        translated = backend.request(SEPARATOR.join(batch), lang).split(SEPARATOR) if len(batch) > 1 else []
+        if len(translated) != len(batch):
+            # the backend merged or split lines, so fall back to one request per string
+            translated = [backend.request(s, lang) for s in batch]
+        for source, target in zip(batch, translated):
+            results[source] = target.strip() if source == source.strip() else target
+            if backend.remember:
+                tm.put(source, key, results[source])
+    for string in single:
+        if limit is None or len(string) < limit:
+            results[string] = backend.request(string, lang)
+        else:
+            results[string] = translate_long(backend, string, lang)
+        if backend.remember:
+            tm.put(string, key, results[string])
+    return [results[s] for s in strings]
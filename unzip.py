@@ -1,24 +1,190 @@
+import hashlib
+import importlib.abc
+import importlib.machinery
+import json
+import os
 import platform
+import shutil
+import struct
 import sys
+import threading
 import zipfile
+import zlib
 from pathlib import Path
 
 from calibre.constants import ismacos, iswindows # type: ignore
 from calibre.utils.config import config_dir # type: ignore
 
+from calibre_plugins.grauthornotes.config import prefs # type: ignore
+
 PLUGIN_PATH = Path(config_dir).joinpath('plugins/GR Author Notes.zip')
 PY_VERSION = '.'.join(platform.python_version_tuple()[:2])
 LIBS_PATH = Path(config_dir).joinpath(f"plugins/gr_author_notes-libs-py{PY_VERSION}")
 
+LIBS = ('certifi', 'idna', 'googletrans', 'httpcore', 'sniffio', 'h2', 'hyperframe', 'hpack', 'h11', 'httpx', 'hstspreload', 'rfc3986')
+# Pure Python, so they can be imported from the plugin zip as they are
+ZIP_LIBS = ('googletrans', 'httpcore', 'sniffio', 'h2', 'hyperframe', 'hpack', 'h11', 'httpx', 'hstspreload', 'rfc3986')
+STAMP_PATH = LIBS_PATH.joinpath('.installed.json')
+
+_installed = False
+_lock = threading.Lock()
+
+class ZipResources(importlib.abc.TraversableResources):
+    ### Data files of a package in the plugin zip, for importlib.resources (hstspreload.bin) ###
+
+    def __init__(self, path, package):
+        self.path = path
+        self.package = package
+
+    def files(self):
+        return zipfile.Path(self.path, self.package + '/')
+
+
+class ZipLibFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """
+    Imports bundled packages straight from the plugin zip, without extracting them.
+
+    The zip's directory is read once. A module's source is read from the archive (which
+    is not kept open, so calibre can replace it when the plugin is updated) and
+    compiled when it is first imported, and the code object is kept in memory by the
+    member's CRC, so importing it again (after a plugin reload, say) compiles nothing.
+    Nothing is written to disk, so there are no files for antivirus software to scan.
+
+    Args:
+        path (Path): The plugin zip.
+        packages (tuple): Top-level names of the packages served from it.
+    """
+
+    def __init__(self, path, packages):
+        self.path = str(path)
+        self.packages = frozenset(packages)
+        with zipfile.ZipFile(path) as pluginzip:
+            self.entries = {i.filename: i for i in pluginzip.infolist() if top_level(i.filename) in self.packages}
+        self.code = {}
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.partition('.')[0] not in self.packages:
+            return None
+        base = fullname.replace('.', '/')
+        for filename, package in ((f'{base}/__init__.py', True), (f'{base}.py', False)):
+            if filename in self.entries:
+                spec = importlib.machinery.ModuleSpec(fullname, self, origin=f'{self.path}/{filename}', loader_state=filename, is_package=package)
+                if package:
+                    spec.submodule_search_locations.append(f'{self.path}/{base}')
+                spec.has_location = True
+                return spec
+        return None
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        exec(self.get_code_for(spec.loader_state, spec.origin), module.__dict__)
+
+    def get_code_for(self, filename, origin):
+        info = self.entries[filename]
+        key = (filename, info.CRC)
+        code = self.code.get(key)
+        if code is None:
+            code = self.code[key] = compile(self.read(info), origin, 'exec', dont_inherit=True)
+        return code
+
+    def get_source(self, fullname):
+        ### For tracebacks ###
+        spec = self.find_spec(fullname)
+        if spec is None:
+            raise ImportError(fullname, name=fullname)
+        return self.read(self.entries[spec.loader_state]).decode('utf-8')
+
+    def read(self, info):
+        ### The member's bytes, found from the directory read at start ###
+        with open(self.path, 'rb') as f:
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            data = f.read(info.compress_size)
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        elif info.compress_type != zipfile.ZIP_STORED:
+            raise ImportError(f'Unsupported compression for {info.filename} in {self.path}')
+        if zlib.crc32(data) != info.CRC:
+            raise ImportError(f'{info.filename} in {self.path} has changed since it was opened')
+        return data
+
+    def get_resource_reader(self, fullname):
+        return ZipResources(self.path, fullname.replace('.', '/'))
+
+
+def top_level(filename):
+    top = filename.split('/')[0]
+    return top[:-3] if top.endswith('.py') else top
+
+def read_stamp():
+    try:
+        with open(STAMP_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_stamp(stamp):
+    tmp = STAMP_PATH.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f)
+    os.replace(tmp, STAMP_PATH)
+
+def extract_libs(packages):
+    ### Extract the packages to LIBS_PATH unless the stamp says they already are ###
+    st = PLUGIN_PATH.stat()
+    stamp = read_stamp()
+    if stamp.get('size') == st.st_size and stamp.get('mtime') == st.st_mtime_ns and stamp.get('packages') == list(packages):
+        return
+    with zipfile.ZipFile(PLUGIN_PATH) as pluginzip:
+        infos = [i for i in pluginzip.infolist() if top_level(i.filename) in packages]
+        # the zip's own CRCs, so a rebuilt but identical plugin is not extracted again
+        checksum = hashlib.sha1(json.dumps(sorted((i.filename, i.CRC) for i in infos)).encode()).hexdigest()
+        if stamp.get('checksum') != checksum or stamp.get('python') != PY_VERSION:
+            for name in {i.filename.split('/')[0] for i in infos}:
+                # files dropped from a newer version must not shadow it
+                shutil.rmtree(LIBS_PATH.joinpath(name), ignore_errors=True)
+            for info in infos:
+                pluginzip.extract(info, LIBS_PATH)
+    # written last, so an interrupted extraction is redone next time
+    LIBS_PATH.mkdir(parents=True, exist_ok=True)
+    write_stamp({'size': st.st_size, 'mtime': st.st_mtime_ns, 'checksum': checksum, 'python': PY_VERSION, 'packages': list(packages)})
+
 def install_libs():
-    pluginzip = zipfile.ZipFile(PLUGIN_PATH)
-    filenames = [i for i in pluginzip.namelist() if i.startswith(('bs4', 'certifi', 'idna', 'urllib3', 'requests', 'googletrans', 'httpcore', 'sniffio', 'h2', 'hyperframe', 'hpack', 'h11', 'httpx', 'hstspreload', 'rfc3986'))]
-
-    for file in filenames:
-        pluginzip.extract(file, LIBS_PATH)
-        
-    if LIBS_PATH not in sys.path:
-        sys.path.insert(0, str(LIBS_PATH))
+    """
+    Make the libraries bundled in the plugin zip importable.
+
+    With the ``libs_from_zip`` setting (the default) the pure Python ones are
+    imported from the zip by a ZipLibFinder and only the rest are extracted.
+    Extracted libraries live in LIBS_PATH, once per version of the plugin zip: a
+    stamp of the zip's size, modification time and a checksum of the bundled files
+    is kept next to them, and as long as it matches nothing is opened or written.
+    Only the first call in a process does any work, so every module that imports a
+    bundled library calls this right before, and nothing happens until it is needed.
+    """
+    global _installed
+    if _installed:
+        return
+    with _lock:
+        if _installed:
+            return
+        if not PLUGIN_PATH.is_file():
+            # run from a source checkout (benchmarks), where the libraries sit next to this file
+            _installed = True
+            return
+        packages = LIBS
+        if prefs['libs_from_zip']:
+            if not any(type(f).__name__ == 'ZipLibFinder' for f in sys.meta_path):
+                sys.meta_path.insert(0, ZipLibFinder(PLUGIN_PATH, ZIP_LIBS))
+            packages = tuple(p for p in LIBS if p not in ZIP_LIBS)
+        extract_libs(packages)
+        if str(LIBS_PATH) not in sys.path:
+            sys.path.insert(0, str(LIBS_PATH))
+        _installed = True
 
 def install_chrome():
     cfolder = LIBS_PATH.joinpath('chromedriver')
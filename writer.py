@@ -0,0 +1,130 @@
+import time
+
+from calibre_plugins.grauthornotes.authornotes import clear, save_note # type: ignore
+from calibre_plugins.grauthornotes.timing import stage # type: ignore
+
+class NoteWriter:
+    """
+    Write-behind buffer for the database writes of a run.
+
+    Finished authors are queued with :meth:`add` and written in chunks by
+    :meth:`flush`. Each chunk stores every new author link with a single
+    ``db.set_link_map`` call and then imports (or clears) its notes, and the GUI
+    is told to refresh once per chunk instead of once per author. Only the
+    public ``Cache`` API is used, which takes calibre's write lock itself.
+
+    :meth:`apply` takes the results drained from an :class:`AuthorEngine`, queues
+    them and records what happened to each author in the engine's journal and
+    fingerprint index.
+
+    Only call this from the thread that owns the database writes (the GUI thread
+    in calibre, the main thread in the command line runner).
+
+    Args:
+        db (object): The calibre database (``db.new_api``).
+        gui (object): The calibre main window, refreshed after every chunk.
+        clear (bool): Whether notes are cleared instead of imported.
+        chunk_size (int): Notes written per chunk.
+        max_delay (float): Seconds a queued note may wait for its chunk to fill up.
+    """
+
+    def __init__(self, db, gui, clear=False, chunk_size=50, max_delay=5.0):
+        self.db = db
+        self.gui = gui
+        self.clear = clear
+        self.chunk_size = max(1, int(chunk_size))
+        self.max_delay = max_delay
+        self.links = {}
+        self.pending = []
+        self.since = None
+
+    def apply(self, results, engine, final=False):
+        """
+        Queue the writes for finished authors and flush a chunk if one is due.
+
+        Returns:
+            tuple: The number of links stored and a list of ``(result, state)`` pairs,
+                   state being one of ``imported``, ``unchanged``, ``skipped`` or
+                   ``failed``, for every author that is done with.
+        """
+        events = []
+        for result in results:
+            # a new link is stored even when the note itself failed
+            if result.new_link:
+                self.link(result.name, result.link)
+            if result.ignored:
+                events.append((result, 'skipped'))
+            elif result.unchanged:
+                events.append((result, 'unchanged'))
+            elif self.clear or result.html:
+                self.add(result)
+            else:
+                events.append((result, 'failed'))
+        links, written = self.flush(final)
+        for result, status in written:
+            if self.clear:
+                engine.fingerprints.forget(result.author[0])
+            elif status:
+                engine.fingerprints.commit(result.author[0], self.db.notes_for('authors', result.author[0]))
+            events.append((result, 'imported' if status else 'failed'))
+        for result, state in events:
+            engine.record(result.author[0], 'skipped' if state == 'unchanged' else state)
+        if events and engine.journal is not None:
+            engine.journal.sync()
+        return links, events
+
+    def link(self, name, link):
+        self.links[name] = link
+
+    def add(self, result):
+        if not self.pending:
+            self.since = time.monotonic()
+        self.pending.append(result)
+
+    @property
+    def due(self):
+        ### A chunk is full, or its first note has waited long enough ###
+        if len(self.pending) >= self.chunk_size:
+            return True
+        return bool(self.pending) and time.monotonic() - self.since >= self.max_delay
+
+    def flush(self, final=False):
+        """
+        Write the queued links and notes if a chunk is due (or always, when final).
+
+        Returns:
+            tuple: The number of links stored and a list of ``(result, ok)`` pairs,
+                   one for each author whose note was written or cleared.
+        """
+        if not (final or self.due or (self.links and not self.pending)):
+            return 0, []
+        links, self.links = self.links, {}
+        if links:
+            self.db.set_link_map('authors', links, True)
+            if not self.pending:
+                self.refresh()
+        written = []
+        while self.pending:
+            chunk, self.pending = self.pending[:self.chunk_size], self.pending[self.chunk_size:]
+            with stage('import'):
+                for result in chunk:
+                    written.append((result, self.write(result)))
+            self.refresh()
+            if not final:
+                break
+        self.since = time.monotonic() if self.pending else None
+        return len(links), written
+
+    def refresh(self):
+        if self.gui is not None:
+            self.gui.do_field_item_value_changed()
+
+    def write(self, result):
+        if self.clear:
+            return clear(result.author, self.db)
+        try:
+            save_note(self.db, result.author[0], result.html)
+            return True
+        except Exception as e:
+            print(f"Note import error for {result.name}: {e}")
+            return False